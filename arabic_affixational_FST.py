@@ -1,4 +1,9 @@
-from nltk.tokenize import wordpunct_tokenize
+import os
+import re
+from collections import Counter, OrderedDict, deque, namedtuple
+from itertools import islice
+from sys import intern
+from time import perf_counter_ns
 
 """
     Fall 2015
@@ -13,6 +18,15 @@ from nltk.tokenize import wordpunct_tokenize
 """
 
 VOWELS = ["\u064B", "\u064C", "\u064D", "\u064E", "\u064F", "\u0650", "\u0652", "\u0670", "\u0651"]
+TATWEEL = "\u0640"
+ALEF = "\u0627"
+# آ أ إ ٱ
+ALEF_VARIANTS = ["\u0622", "\u0623", "\u0625", "\u0671"]
+# isolated and final forms of lam + alef madda, hamza above, hamza below and bare alef
+LAM_ALEF_LIGATURES = {"\uFEF5": "\u0644\u0622", "\uFEF6": "\u0644\u0622",
+                      "\uFEF7": "\u0644\u0623", "\uFEF8": "\u0644\u0623",
+                      "\uFEF9": "\u0644\u0625", "\uFEFA": "\u0644\u0625",
+                      "\uFEFB": "\u0644\u0627", "\uFEFC": "\u0644\u0627"}
 
 PREFIX_LEN_3 = ['\u0643\u0627\u0644', '\u0628\u0627\u0644', '\u0648\u0644\u0644', '\u0648\u0627\u0644']
 PREFIX_LEN_2 = ['\u0627\u0644', '\u0644\u0644']
@@ -25,34 +39,387 @@ SUFFIX_LEN_2 = ['\u0648\u0646', '\u0627\u062a', '\u0627\u0646', '\u064a\u0646',
 PREFIX_LEN_1 = ['\u0644', '\u0628', '\u0641', '\u0648', '\u064a', '\u062a', '\u0646', '\u0627']
 SUFFIX_LEN_1 = ['\u0629', '\u0647', '\u064a', '\u0643', '\u062a', '\u0627', '\u0646']
 
-non_verbal_p_3 = ['\u0643\u0627\u0644', '\u0628\u0627\u0644', '\u0648\u0644\u0644', '\u0648\u0627\u0644']
-non_verbal_p_2 = ['\u0627\u0644', '\u0644\u0644']
-non_verbal_p_1 = ['\u0648', '\u0644', '\u0628', '\u0641']
-non_verbal_s_3 = ['\u0643\u0645\u0627', '\u0647\u0645\u0627']
-non_verbal_s_2 = ['\u0643\u0645', '\u0643\u0646', '\u0647\u0627', '\u0647\u0645', '\u0647\u0646', '\u0646\u064a']
-non_verbal_s_1 = ['\u064a', '\u0643', '\u0647']
-pres_verbal_p = ['\u064A', '\u062A', '\u0644', '\u0628']
-pres_verbal_s_2 = ['\u064A\u0646', '\u0627\u0646', '\u0648\u0646']
-pres_verbal_s_1 = ['\u0646']
-past_verbal_s_3 = ['\u062a\u0645\u0627']
-past_verbal_s_2 = ['\u0646\u0627', '\u062a\u0645', '\u062a\u0646', '\u062a\u0627', '\u0648\u0627']
-past_verbal_s_1 = ['\u062a', '\u0627', '\u0646']
+"""the morphological info attached to each affix. Tags are stored as small
+integer codes, shared by every analysis, and only turned back into the
+strings below on demand"""
+NO_INFO = "no morphological information"
+# non-past prefix + suffix agreement, both units are explained by one tag
+PRESENT_PAIR_TAGS = {
+    ("\u064a", "\u0627\u0646"): "p+s: 3rd du m non-past",  # ي ان
+    ("\u064a", "\u0648\u0646"): "p+s: 3rd pl m non-past",  # ي ون
+    ("\u064a", "\u0646"): "p+s: 3rd pl f non-past",  # ي ن
+    ("\u062a", "\u0627\u0646"): "p+s: 2nd du m/f non-past OR 3rd du f non-past",  # ت ان
+    ("\u062a", "\u0648\u0646"): "p+s: 2nd pl m non-past",  # ت ون
+    ("\u062a", "\u064a\u0646"): "p+s: 2nd s f non-past",  # ت ين
+    ("\u062a", "\u0646"): "p+s: 2nd pl f non-past",  # ت ن
+}
+# non-past prefixes, ل and ب mark the word as verbal but are tagged as particles
+PRESENT_PREFIX_TAGS = {
+    "\u064a": "p: 3rd s m non-past",  # ي
+    "\u062a": "p: 2nd s m non-past OR 3rd s f non-past",  # ت
+    "\u0644": None,  # ل
+    "\u0628": None,  # ب
+}
+# suffixes that agree with a non-past prefix
+PRESENT_SUFFIXES = ["\u064A\u0646", "\u0627\u0646", "\u0648\u0646", "\u0646"]
+PAST_SUFFIX_TAGS = {
+    "\u062a\u0645\u0627": "s: 2nd du m/f past",  # تما
+    "\u0646\u0627": "s: 1st pl m/f past",  # نا
+    "\u062a\u0645": "s: 2nd p m past",  # تم
+    "\u062a\u0646": "s: 2nd p f past",  # تن
+    "\u062a\u0627": "s: 3rd du f past",  # تا
+    "\u0648\u0627": "s: 3rd pl m past",  # وا
+    "\u062a": "s: 1st s m/f past OR 2nd s m/f past OR 3rd s f past",  # ت
+    "\u0627": "s: 3rd du m past",  # ا
+    "\u0646": "s: 3rd pl f",  # ن
+}
+PREFIX_TAGS = {
+    "\u0643\u0627\u0644": "p: as + def",  # كال
+    "\u0628\u0627\u0644": "p: by + def",  # بال
+    "\u0648\u0644\u0644": "p: and + to + def",  # ولل
+    "\u0648\u0627\u0644": "p: and + def",  # وال
+    "\u0627\u0644": "p: def",  # ال
+    "\u0644\u0644": "p: to + def",  # لل
+    "\u0648": "p: and",  # و
+    "\u0644": "p: to",  # ل
+    "\u0628": "p: by",  # ب
+    "\u0641": "p: so",  # ف
+}
+# pronoun suffixes read as objects on verbs
+OBJECT_SUFFIX_TAGS = {
+    "\u0643\u0645\u0627": "s: 2nd du m/f object",  # كما
+    "\u0647\u0645\u0627": "s: 3rd du m/f object",  # هما
+    "\u0643\u0645": "s: 2nd pl m object",  # كم
+    "\u0643\u0646": "s: 2rd pl f object",  # كن
+    "\u0647\u0627": "s: 3rd s f object",  # ها
+    "\u0647\u0645": "s: 3rd pl m object",  # هم
+    "\u0647\u0646": "s: 3rd pl f object",  # هن
+    "\u0646\u064a": "s: 1st s m/f object",  # ني
+    "\u0647": "s: 3rd s m object",  # ه
+    "\u0643": "s: 2nd s m/f object",  # ك
+}
+# and as possessives elsewhere
+POSSESSIVE_SUFFIX_TAGS = {
+    "\u0643\u0645\u0627": "s: 2nd du m/f possessive",  # كما
+    "\u0647\u0645\u0627": "s: 3rd du m/f possesive",  # هما
+    "\u0643\u0645": "s: 2nd pl m possesive",  # كم
+    "\u0643\u0646": "s: 2rd pl f possesive",  # كن
+    "\u0647\u0627": "s: 3rd s f possesive",  # ها
+    "\u0647\u0645": "s: 3rd pl m possesive",  # هم
+    "\u0647\u0646": "s: 3rd pl f possesive",  # هن
+    "\u0647": "s: 3rd s m possesive",  # ه
+    "\u064a": "s: 1st s m/f possessive",  # ي
+    "\u0643": "s: 2nd s m/f possesive",  # ك
+}
+
+TAG_NAMES = [NO_INFO]
+TAG_CODES = {NO_INFO: 0}
+
+
+def encode_tags(table):
+    """replaces the tag strings of a table with their codes, giving new tags the next free code"""
+    for key, name in table.items():
+        if name is not None:
+            if name not in TAG_CODES:
+                TAG_CODES[name] = len(TAG_NAMES)
+                TAG_NAMES.append(name)
+            table[key] = TAG_CODES[name]
+
+
+for tag_table in (PRESENT_PAIR_TAGS, PRESENT_PREFIX_TAGS, PAST_SUFFIX_TAGS, PREFIX_TAGS,
+                  OBJECT_SUFFIX_TAGS, POSSESSIVE_SUFFIX_TAGS):
+    encode_tags(tag_table)
+
+
+def compile_trie(affixes):
+    """builds a character trie (nested dicts) from a list of affixes, the key
+    None marks that the path walked so far is a complete affix"""
+    trie = dict()
+    for affix in affixes:
+        node = trie
+        for ch in affix:
+            node = node.setdefault(ch, dict())
+        node[None] = True
+    return trie
+
+
+def trie_matches(trie, chars, limit):
+    """walks the trie over at most limit characters and returns the lengths
+    of every affix matched along the way, shortest first"""
+    matches = []
+    node = trie
+    for depth, ch in enumerate(chars, 1):
+        if depth > limit:
+            break
+        node = node.get(ch)
+        if node is None:
+            break
+        if None in node:
+            matches.append(depth)
+    return matches
+
+
+"""prefixes are matched reading the word forwards, suffixes are stored
+reversed so that they can be matched reading the word backwards"""
+PREFIX_TRIE = compile_trie(PREFIX_LEN_3 + PREFIX_LEN_2 + PREFIX_LEN_1)
+SUFFIX_TRIE = compile_trie([s[::-1] for s in SUFFIX_LEN_3 + SUFFIX_LEN_2 + SUFFIX_LEN_1])
+
+
+DEFAULT_CACHE_SIZE = 65536
+
+
+class LRUCache(object):
+    """bounded mapping that evicts the least recently used entry once maxsize
+    is reached, counting hits, misses and evictions so that callers can size
+    it from their own traffic. A maxsize of 0 disables caching"""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key):
+        """returns the cached value for key, or None if it is not cached"""
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.data[key] = value
+        self.data.move_to_end(key)
+        self.evict()
+
+    def evict(self):
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        self.evict()
+
+    def clear(self):
+        """drops every entry and resets the counters"""
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.data), 'maxsize': self.maxsize}
+
+
+"""segmentations are cached on the devocalized word, analyses on the
+(prefix, suffix) pair, as the root plays no part in the analysis, and
+n-best candidates on the devocalized word"""
+SEGMENT_CACHE = LRUCache()
+ANALYZE_CACHE = LRUCache()
+NBEST_CACHE = LRUCache()
+
+
+def set_cache_size(maxsize):
+    """bounds every cache to maxsize entries, 0 turns caching off"""
+    SEGMENT_CACHE.resize(maxsize)
+    ANALYZE_CACHE.resize(maxsize)
+    NBEST_CACHE.resize(maxsize)
+
+
+def clear_caches():
+    SEGMENT_CACHE.clear()
+    ANALYZE_CACHE.clear()
+    NBEST_CACHE.clear()
+
+
+def cache_stats():
+    """returns the counters of every cache as a dict of dicts"""
+    return {'segment': SEGMENT_CACHE.stats(), 'analyze': ANALYZE_CACHE.stats(), 'nbest': NBEST_CACHE.stats()}
+
+
+class Metrics(object):
+    """opt-in instrumentation of the FST: how often each rule fires, the
+    cumulative time spent in each stage and the lengths of the words seen.
+
+    rules are counted when the rule engine runs, i.e. on cache misses, the
+    tags given by analyze() are counted for every word"""
+
+    def __init__(self):
+        self.rules = Counter()
+        self.stage_ns = Counter()
+        self.stage_calls = Counter()
+        self.word_lengths = Counter()
+
+    def hit(self, rule):
+        self.rules[rule] += 1
+
+    def time(self, stage, start):
+        """adds the time since start (from perf_counter_ns) to stage, returning the current time"""
+        now = perf_counter_ns()
+        self.stage_ns[stage] += now - start
+        self.stage_calls[stage] += 1
+        return now
+
+    def segment(self, word):
+        """segment() with each stage timed"""
+        start = perf_counter_ns()
+        word = remove_vocalization(word)
+        now = self.time('remove_vocalization', start)
+        self.word_lengths[len(word)] += 1
+        segments = SEGMENT_CACHE.get(word)
+        if segments is None:
+            if len(word) > 3:
+                prefix, root, suffix = find_long_affix(word)
+                now = self.time('find_long_affix', now)
+                segments = find_short_affix(prefix, root, suffix)
+                now = self.time('find_short_affix', now)
+            else:
+                segments = "", word, ""
+            SEGMENT_CACHE.put(word, segments)
+        self.time('segment', start)
+        return segments
+
+    def analyze(self, prefix, root, suffix):
+        """analyze_compact() timed, with its tags counted"""
+        start = perf_counter_ns()
+        analysis = lookup_analysis(prefix, root, suffix)
+        self.time('analyze', start)
+        for tag in analysis.tags:
+            self.rules['analyze:' + TAG_NAMES[tag]] += 1
+        return analysis
+
+    def snapshot(self):
+        return {'rules': dict(self.rules),
+                'stages': dict((stage, {'calls': self.stage_calls[stage], 'seconds': self.stage_ns[stage] / 1e9})
+                               for stage in self.stage_ns),
+                'word_lengths': dict(sorted(self.word_lengths.items())),
+                'caches': cache_stats()}
+
+    def prometheus(self, max_length=12):
+        """the snapshot in the Prometheus text exposition format, word lengths
+        being a histogram with one bucket per length up to max_length"""
+        def label(value):
+            return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        lines = ['# HELP arabic_fst_rule_hits_total times each rule of the FST fired',
+                 '# TYPE arabic_fst_rule_hits_total counter']
+        lines += ['arabic_fst_rule_hits_total{rule=%s} %d' % (label(rule), count)
+                  for rule, count in sorted(self.rules.items())]
+        lines += ['# HELP arabic_fst_stage_seconds_total time spent in each stage',
+                  '# TYPE arabic_fst_stage_seconds_total counter']
+        lines += ['arabic_fst_stage_seconds_total{stage=%s} %.9f' % (label(stage), ns / 1e9)
+                  for stage, ns in sorted(self.stage_ns.items())]
+        lines += ['# HELP arabic_fst_stage_calls_total calls of each stage',
+                  '# TYPE arabic_fst_stage_calls_total counter']
+        lines += ['arabic_fst_stage_calls_total{stage=%s} %d' % (label(stage), calls)
+                  for stage, calls in sorted(self.stage_calls.items())]
+        lines += ['# HELP arabic_fst_word_length length of the devocalized words segmented',
+                  '# TYPE arabic_fst_word_length histogram']
+        cumulative = 0
+        for length in range(1, max_length + 1):
+            cumulative += self.word_lengths[length] + (self.word_lengths[0] if length == 1 else 0)
+            lines.append('arabic_fst_word_length_bucket{le="%d"} %d' % (length, cumulative))
+        count = sum(self.word_lengths.values())
+        lines.append('arabic_fst_word_length_bucket{le="+Inf"} %d' % count)
+        lines.append('arabic_fst_word_length_sum %d' % sum(k * v for k, v in self.word_lengths.items()))
+        lines.append('arabic_fst_word_length_count %d' % count)
+        for name, metric, kind in [('hits', 'hits_total', 'counter'), ('misses', 'misses_total', 'counter'),
+                                   ('evictions', 'evictions_total', 'counter'), ('size', 'size', 'gauge')]:
+            lines.append('# TYPE arabic_fst_cache_%s %s' % (metric, kind))
+            lines += ['arabic_fst_cache_%s{cache=%s} %d' % (metric, label(cache), stats[name])
+                      for cache, stats in sorted(cache_stats().items())]
+        return '\n'.join(lines) + '\n'
+
+
+"""None unless instrumentation is turned on, so that the hot path only pays
+for an `is not None` check"""
+METRICS = None
+
+
+def enable_metrics():
+    """turns instrumentation on with fresh counters, returning the Metrics"""
+    global METRICS
+    METRICS = Metrics()
+    return METRICS
+
+
+def disable_metrics():
+    global METRICS
+    METRICS = None
+
+
+def metrics_snapshot():
+    """the current metrics as a dict, or None if instrumentation is off"""
+    return METRICS.snapshot() if METRICS is not None else None
+
+
+def metrics_prometheus():
+    return METRICS.prometheus() if METRICS is not None else ''
 
 
 def segment(word):
     """ segments a word into its derivational and affixational morphological units"""
-    word = remove_vocalization(word)
+    if METRICS is not None:
+        return METRICS.segment(word)
+    return segment_devocalized(remove_vocalization(word))
+
+
+def segment_devocalized(word):
+    """segment() of a word that has already been through remove_vocalization()"""
+    segments = SEGMENT_CACHE.get(word)
+    if segments is not None:
+        return segments
     if len(word) > 3:
         prefix, root, suffix = find_long_affix(word)
-        prefix, root, suffix = find_short_affix(prefix, root, suffix)
-        return prefix, root, suffix
+        segments = find_short_affix(prefix, root, suffix)
     else:
-        return "", word, ""
+        segments = "", word, ""
+    SEGMENT_CACHE.put(word, segments)
+    return segments
+
+
+def make_normalization_table(unify_alef=False, split_lam_alef=False):
+    """builds a str.translate() table that deletes vocalization and tatweel,
+    optionally mapping the alef variants to a bare alef and splitting the
+    lam + alef ligatures into their two letters"""
+    table = dict.fromkeys(map(ord, VOWELS + [TATWEEL]))
+    if split_lam_alef:
+        for ligature, letters in LAM_ALEF_LIGATURES.items():
+            table[ord(ligature)] = letters[0] + ALEF if unify_alef else letters
+    if unify_alef:
+        for variant in ALEF_VARIANTS:
+            table[ord(variant)] = ALEF
+    return table
+
+
+NORMALIZATION_TABLE = make_normalization_table()
+# the (unify_alef, split_lam_alef) settings NORMALIZATION_TABLE was built with
+NORMALIZATION = (False, False)
+
+
+def set_normalization(unify_alef=False, split_lam_alef=False):
+    """switches the optional normalizations applied by remove_vocalization()
+    on or off. The caches are keyed on the normalized word so they stay valid"""
+    global NORMALIZATION_TABLE, NORMALIZATION
+    NORMALIZATION_TABLE = make_normalization_table(unify_alef, split_lam_alef)
+    NORMALIZATION = (unify_alef, split_lam_alef)
 
 
 def remove_vocalization(word):
-    """short vowels, case markers, geminate consonant marker removed"""
-    return ''.join(ch for ch in word if ch not in VOWELS)
+    """short vowels, case markers, geminate consonant marker and tatweel removed,
+    along with any normalization turned on by set_normalization()"""
+    return word.translate(NORMALIZATION_TABLE)
 
 
 def find_long_affix(input_word):
@@ -64,36 +431,39 @@ def find_long_affix(input_word):
     prefix = ''
     suffix = ''
 
-    if len(input_word) >= 6:
-        for p3 in PREFIX_LEN_3:
-            if input_word.startswith(p3):
-                root = input_word[3:]
-                prefix = input_word[:3]
+    # length 3 affixes are only looked for in words of length 6 or more
+    limit = 3 if len(input_word) >= 6 else 2
+    if len(input_word) >= 5:
+        prefix_lens = trie_matches(PREFIX_TRIE, input_word, limit)
+        suffix_lens = trie_matches(SUFFIX_TRIE, reversed(input_word), limit)
+    else:
+        prefix_lens = suffix_lens = []
+
     # grab only longer prefix if available
-    if len(input_word) >= 5 and not prefix:
-        for p2 in PREFIX_LEN_2:
-            if input_word.startswith(p2):
-                root = input_word[2:]
-                prefix = input_word[:2]
-
-    if len(input_word) >= 6:
-        for s3 in SUFFIX_LEN_3:
-            if input_word.endswith(s3):
-                if root:
-                    root = root[:-3]
-                    suffix = root[-3:]
-                else:
-                    root = input_word[:-3]
-                    suffix = input_word[-3:]
-    if len(input_word) >= 5 and not suffix:
-        for s2 in SUFFIX_LEN_2:
-            if input_word.endswith(s2):
-                if root:
-                    root = root[:-2]
-                    suffix = root[-2:]
-                else:
-                    root = input_word[:-2]
-                    suffix = input_word[-2:]
+    if prefix_lens and prefix_lens[-1] >= 2:
+        root = input_word[prefix_lens[-1]:]
+        prefix = input_word[:prefix_lens[-1]]
+        if METRICS is not None:
+            METRICS.hit('find_long_affix:prefix_len_%d' % len(prefix))
+
+    if 3 in suffix_lens:
+        if METRICS is not None:
+            METRICS.hit('find_long_affix:suffix_len_3')
+        if root:
+            root = root[:-3]
+            suffix = root[-3:]
+        else:
+            root = input_word[:-3]
+            suffix = input_word[-3:]
+    if 2 in suffix_lens and not suffix:
+        if METRICS is not None:
+            METRICS.hit('find_long_affix:suffix_len_2')
+        if root:
+            root = root[:-2]
+            suffix = root[-2:]
+        else:
+            root = input_word[:-2]
+            suffix = input_word[-2:]
 
     """once we have stripped the root input_word of these longer affixes, we will
     look to see if we have found a root input_word, and then look to remove the
@@ -107,10 +477,14 @@ def find_long_affix(input_word):
         If we find this append to the prefix gathered already so far"""
         prefix = '\u0648' + prefix
         root = root[1:]
+        if METRICS is not None:
+            METRICS.hit('find_long_affix:and_after_long_affix')
     elif len(input_word) >= 4 and input_word[:2] == '\u0648\u0648':
         """check for the 'and' marker in the case we haven't found a separable input_word yet"""
         prefix = '\u0648'
         root = input_word[1:]
+        if METRICS is not None:
+            METRICS.hit('find_long_affix:and')
 
     """if we haven't found any long affix so far make the root input_word equal to the input word"""
     if not root:
@@ -122,88 +496,91 @@ def find_long_affix(input_word):
 def find_short_affix(prefix, root, suffix):
     """length one suffixes and prefixes are separated from the 'main'
     part of the word. Depending on the length of the word, we would
-    expect to find different verbal patterns (found in the extremely
-    long conditionals/cases that start each different word len separation)
+    expect to find different verbal patterns (found in the PATTERN_LETTERS
+    table, with one entry per word len)
 
     in the NLTK there is a stemmer for Arabic (isri), whose algorithm I in part utilized
     in developing the patterns for Arabic's root morphology, which is not the
     type of morphology that this program analyzes, but is necessary
     to understand in order to figure out which letters are actually
     suffix or prefixes"""
-    #  مفعل - فاعل - فعال - فعول - فعيل - فعلة
-    if len(root) == 4:
-        prefix, root, suffix = check_len_4(prefix, root, suffix)
-    if len(root) == 5:
-        prefix, root, suffix = check_len_5(prefix, root, suffix)
-    # مستفعل - استفعل - مفعالة - افتعال - افعوعل - تفاعيل -
-    if len(root) == 6:
-        prefix, root, suffix = check_len_6(prefix, root, suffix)
     if len(root) == 7:
         prefix, root, suffix = find_affix_len_1(prefix, root, suffix, 7)
         if len(root) == 6:
-            prefix, root, suffix = check_len_6(prefix, root, suffix)
+            prefix, root, suffix = check_pattern(prefix, root, suffix)
+    elif len(root) in PATTERN_TABLES:
+        prefix, root, suffix = check_pattern(prefix, root, suffix)
 
     return prefix, root, suffix
 
 
 def find_affix_len_1(prefix, root, suffix, original_root_len):
-    for s1 in SUFFIX_LEN_1:
-        if root.endswith(s1) and not suffix:
-            suffix = root[-1] + suffix
-            root = root[:-1]
-            break
+    # a length one affix is a terminal child of the root of its trie
+    if not suffix and None in SUFFIX_TRIE.get(root[-1:], ()):
+        suffix = root[-1] + suffix
+        root = root[:-1]
+        if METRICS is not None:
+            METRICS.hit('find_affix_len_1:suffix')
     if len(root) == original_root_len:
-        for p1 in PREFIX_LEN_1:
-            if root.startswith(p1) and not prefix:
-                prefix = prefix + root[0]
-                root = root[1:]
-                break
+        if not prefix and None in PREFIX_TRIE.get(root[:1], ()):
+            prefix = prefix + root[0]
+            root = root[1:]
+            if METRICS is not None:
+                METRICS.hit('find_affix_len_1:prefix')
     return prefix, root, suffix
 
 
-def check_len_4(prefix, root, suffix):
-    if root[0] != '\u0645' \
-            and root[1] != '\u0627' \
-            and root[2] not in ['\u0627', '\u0648', '\u064A'] \
-            and root[3] != '\u0629':
-        prefix, root, suffix = find_affix_len_1(prefix, root, suffix, 4)
-    return prefix, root, suffix
-
-
-def check_len_5(prefix, root, suffix):
+"""for each word len, the letters that at each position mark the word as
+following one of the derived patterns listed above it, in which case no
+length one affix is stripped from it (e.g. the initial م of مفعل or the ت
+of افتعل belong to the pattern and not to a prefix)"""
+PATTERN_LETTERS = {
+    #  مفعل - فاعل - فعال - فعول - فعيل - فعلة
+    4: ['\u0645', '\u0627', '\u0627\u0648\u064A', '\u0629'],
     # افتعل - افاعل - مفعول - مفعال - مفعيل - مفعلة - تفعلة - افعلة - مفتعل - يفتعل - تفتعل - مفاعل - تفاعل - فعولة -
     #  فعالة - انفعل - منفعل - افعال - فعلان - تفعيل - فاعول - فواعل - فعائل - فاعلة - فعالي -
-    len_five_patterns = {0: ['\u0627', '\u062a'], 1: ['\u0627', '\u064a', '\u0648'], 2: ['\u0627', '\u062a', '\u0645'],
-                         3: ['\u0645', '\u064a', '\u062a'], 4: ['\u0645', '\u062a'], 5: ['\u0627', '\u0648'],
-                         6: ['\u0627', '\u0645']}
-    if (root[2] not in len_five_patterns[0] and root[0] != '\u0627') \
-            and (root[3] not in len_five_patterns[1] and root[0] != '\u0645') \
-            and (root[0] not in len_five_patterns[2] and root[4] != '\u0629') \
-            and (root[0] not in len_five_patterns[3] and root[2] != '\u062A') \
-            and (root[0] not in len_five_patterns[4] and root[2] != '\u0627') \
-            and (root[2] not in len_five_patterns[5] and root[4] != '\u0629') \
-            and (root[0] not in len_five_patterns[6] and root[1] != '\u0646') \
-            and (root[3] != '\u0627' and root[0] != '\u0627') \
-            and (root[4] != '\u0646' and root[3] != '\u0627') \
-            and (root[3] != '\u064A' and root[0] != '\u062A') \
-            and (root[3] != '\u0648' and root[1] != '\u0627') \
-            and (root[2] != '\u0627' and root[1] != '\u0648') \
-            and (root[3] != '\u0626' and root[2] != '\u0627') \
-            and (root[4] != '\u0629' and root[1] != '\u0627') \
-            and (root[4] != '\u064A' and root[2] != '\u0627'):
-        prefix, root, suffix = find_affix_len_1(prefix, root, suffix, 5)
+    5: ['\u0627\u062A\u0645\u064A', '\u0627\u0646\u0648', '\u0627\u062A\u0648',
+        '\u0627\u0626\u0648\u064A', '\u0629\u0646\u064A'],
+    # مستفعل - استفعل - مفعالة - افتعال - افعوعل - تفاعيل -
+    6: ['\u0627\u062A\u0645', '', '\u0627\u062A', '\u0627\u0648', '\u0627\u064A', '\u0629'],
+}
+# positions holding the same letter in a pattern, e.g. the repeated ع of افعوعل
+PATTERN_REPEATS = {4: [], 5: [], 6: [(2, 4)]}
+
+PATTERN_TABLES = dict((length, [frozenset(letters) for letters in positions])
+                      for length, positions in PATTERN_LETTERS.items())
+
+
+def is_pattern(root):
+    """true if root has a pattern letter at any position, one set lookup per letter"""
+    if any(map(frozenset.__contains__, PATTERN_TABLES[len(root)], root)):
+        return True
+    for i, j in PATTERN_REPEATS[len(root)]:
+        if root[i] == root[j]:
+            return True
+    return False
+
+
+def check_pattern(prefix, root, suffix):
+    pattern = is_pattern(root)
+    if METRICS is not None:
+        METRICS.hit('check_len_%d:%s' % (len(root), 'pattern' if pattern else 'no_pattern'))
+    if not pattern:
+        prefix, root, suffix = find_affix_len_1(prefix, root, suffix, len(root))
     return prefix, root, suffix
 
 
-def check_len_6(prefix, root, suffix):
-    if not root.startswith('\u0627\u0633\u062a') \
-            and not root.startswith('\u0645\u0633\u062a') \
-            and (root[0] != '\u0645' and root[3] != '\u0627' and root[5] != '\u0629') \
-            and (root[0] != '\u0627' and root[2] != '\u062A' and root[4] != '\u0627') \
-            and (root[0] != '\u0627' and root[3] != '\u0648' and root[2] != root[4]) \
-            and (root[0] != '\u062A' and root[2] != '\u0627' and root[4] != '\u064A'):
-        prefix, root, suffix = find_affix_len_1(prefix, root, suffix, 6)
-    return prefix, root, suffix
+class Analysis(namedtuple('Analysis', 'prefix root suffix tags')):
+    """an analysed word, tags being a tuple of codes into TAG_NAMES"""
+    __slots__ = ()
+
+    @property
+    def info(self):
+        return [TAG_NAMES[tag] for tag in self.tags]
+
+    def as_list(self):
+        """the [prefix, root, suffix, info] list returned by analyze()"""
+        return [self.prefix, self.root, self.suffix, self.info]
 
 
 def analyze(prefix, root, suffix):
@@ -220,203 +597,256 @@ def analyze(prefix, root, suffix):
 
     note: Arabic possessive markers are identical to the
     object pronouns that appear on verbs """
+    return analyze_compact(prefix, root, suffix).as_list()
 
-    info = list()
-    p_found = False
-    s_found = False
-    verbal = False
-    if not(prefix or suffix):
-        info.append("no morphological information")
-        return [prefix, root, suffix, info]
 
-    p_found, s_found, verbal = check_verb(prefix, suffix, verbal, p_found, s_found, info)
-    if p_found and s_found:
-        return [prefix, root, suffix, info]
+def analyze_compact(prefix, root, suffix):
+    """analyze() as an Analysis, whose affixes are interned and whose tag tuple
+    is shared with every other analysis of the same affixes"""
+    if METRICS is not None:
+        return METRICS.analyze(prefix, root, suffix)
+    return lookup_analysis(prefix, root, suffix)
 
-    p_found = check_prefix(info, p_found, prefix)
-    if p_found and s_found:
-        return [prefix, root, suffix, info]
 
-    check_suffix(suffix, s_found, verbal, info)
+def lookup_analysis(prefix, root, suffix):
+    key = (prefix, suffix)
+    cached = ANALYZE_CACHE.get(key)
+    if cached is None:
+        cached = (intern(prefix), intern(suffix), morphological_tags(prefix, suffix))
+        ANALYZE_CACHE.put(key, cached)
+    return Analysis(cached[0], root, cached[1], cached[2])
 
-    if not info:
-        info.append("no morphological information")
-
-    return [prefix, root, suffix, info]
 
+def morphological_tags(prefix, suffix):
+    """uncached analysis of a prefix and suffix as a tuple of tag codes, see analyze()"""
+    if not(prefix or suffix):
+        return TAG_CODES[NO_INFO],
 
-def check_suffix(suffix, s_found, verbal, info):
-    if suffix and not s_found:
-        if suffix in non_verbal_s_3:
-            if verbal:
-                if suffix == "\u0643\u0645\u0627":  # كما
-                    info.append("s: 2nd du m/f object")
-                elif suffix == "\u0647\u0645\u0627":  # هما
-                    info.append("s: 3rd du m/f object")
-            else:
-                if suffix == "\u0643\u0645\u0627":  # كما
-                    info.append("s: 2nd du m/f possessive")
-                elif suffix == "\u0647\u0645\u0627":  # هما
-                    info.append("s: 3rd du m/f possesive")
-        elif suffix in non_verbal_s_2:
-            if verbal:
-                if suffix == "\u0643\u0645":  # كم
-                    info.append("s: 2nd pl m object")
-                elif suffix == "\u0643\u0646":  # كن
-                    info.append("s: 2rd pl f object")
-                elif suffix == "\u0647\u0627":  # ها
-                    info.append("s: 3rd s f object")
-                elif suffix == "\u0647\u0645":  # هم
-                    info.append("s: 3rd pl m object")
-                elif suffix == "\u0647\u0646":  # هن
-                    info.append("s: 3rd pl f object")
-                elif suffix == "\u0646\u0627":  # نا
-                    info.append("s: 1st pl m/f object")
-                elif suffix == "\u0646\u064a":  # ني
-                    info.append("s: 1st s m/f object")
-            else:
-                if suffix == "\u0643\u0645":  # كم
-                    info.append("s: 2nd pl m possesive")
-                elif suffix == "\u0643\u0646":  # كن
-                    info.append("s: 2rd pl f possesive")
-                elif suffix == "\u0647\u0627":  # ها
-                    info.append("s: 3rd s f possesive")
-                elif suffix == "\u0647\u0645":  # هم
-                    info.append("s: 3rd pl m possesive")
-                elif suffix == "\u0647\u0646":  # هن
-                    info.append("s: 3rd pl f possesive")
-                elif suffix == "\u0646\u0627":  # نا
-                    info.append("s: 1st pl m/f possesive")
-        elif suffix in non_verbal_s_1:
-            if verbal:
-                if suffix == "\u0647":  # ه
-                    info.append("s: 3rd s m object")
-                elif suffix == "\u0643":  # ك
-                    info.append("s: 2nd s m/f object")
-            else:
-                if suffix == "\u0647":  # ه
-                    info.append("s: 3rd s m possesive")
-                elif suffix == "\u064a":  # ي
-                    info.append("s: 1st s m/f possessive")
-                elif suffix == "\u0643":  # ك
-                    info.append("s: 2nd s m/f possesive")
-
-
-def check_prefix(info, p_found, prefix):
-    if not p_found and prefix:
-        if prefix in non_verbal_p_3:
-            if prefix == "\u0643\u0627\u0644":  # كال
-                info.append("p: as + def")
-            elif prefix == "\u0628\u0627\u0644":  # بال
-                info.append("p: by + def")
-            elif prefix == "\u0648\u0644\u0644":  # ولل
-                info.append("p: and + to + def")
-            elif prefix == "\u0648\u0627\u0644":  # وال
-                info.append("p: and + def")
-            p_found = True
-        elif prefix in non_verbal_p_2:
-            if prefix == "\u0627\u0644":  # ال
-                info.append("p: def")
-            elif prefix == "\u0644\u0644":  # لل
-                info.append("p: to + def")
-            p_found = True
-        elif prefix in non_verbal_p_1:
-            if prefix == "\u0648":  # و
-                info.append("p: and")
-            elif prefix == "\u0644":  # ل
-                info.append("p: to")
-            elif prefix == "\u0628":  # ب
-                info.append("p: by")
-            elif prefix == "\u0641":  # ف
-                info.append("p: so")
-            p_found = True
-    return p_found
-
-
-def check_verb(prefix, suffix, verbal, p_found, s_found, info):
+    tags = []
+    p_found = False
+    s_found = False
+    verbal = False
     if prefix:
-        if prefix in pres_verbal_p:
+        if prefix in PRESENT_PREFIX_TAGS:
             verbal = True
-            if prefix == "\u064a":  # ي
-                if suffix and suffix in pres_verbal_s_2:
-                    if suffix == "\u0627\u0646":  # ان
-                        info.append("p+s: 3rd du m non-past")
-                        p_found = True
-                        s_found = True
-                    elif suffix == "\u0648\u0646":  # ون
-                        info.append("p+s: 3rd pl m non-past")
-                        p_found = True
-                        s_found = True
-                elif suffix and suffix in pres_verbal_s_1:
-                    if suffix == "\u0646":  # ن
-                        info.append("p+s: 3rd pl f non-past")
-                        p_found = True
-                        s_found = True
-                else:
-                    info.append("p: 3rd s m non-past")
-                    p_found = True
-            elif prefix == "\u062a":  # ت
-                if suffix != "" and suffix in pres_verbal_s_2:
-                    if suffix == "\u0627\u0646":  # ان
-                        info.append("p+s: 2nd du m/f non-past OR 3rd du f non-past")
-                        p_found = True
-                        s_found = True
-                    elif suffix == "\u0648\u0646":  # ون
-                        info.append("p+s: 2nd pl m non-past")
-                        p_found = True
-                        s_found = True
-                    elif suffix == "\u064a\u0646":  # ين
-                        info.append("p+s: 2nd s f non-past")
-                        p_found = True
-                        s_found = True
-                elif suffix != "" and suffix in pres_verbal_s_1:
-                    if suffix == "\u0646":  # ن
-                        info.append("p+s: 2nd pl f non-past")
-                        p_found = True
-                        s_found = True
-                else:
-                    info.append("p: 2nd s m non-past OR 3rd s f non-past")
-                    p_found = True
-            elif prefix == "\u0627":  # ا
-                info.append("p: 1st m/f s non-past")
-                p_found = True
-            elif prefix == "\u0646":  # ن
-                info.append("p: 1st m/f pl non-past")
+            tag = PRESENT_PAIR_TAGS.get((prefix, suffix))
+            if tag is not None:
+                tags.append(tag)
+                p_found = s_found = True
+            elif suffix not in PRESENT_SUFFIXES and PRESENT_PREFIX_TAGS[prefix] is not None:
+                tags.append(PRESENT_PREFIX_TAGS[prefix])
                 p_found = True
-    elif suffix:
-        if suffix in past_verbal_s_3:  # تما
-            verbal = True
-            info.append("s: 2nd du m/f past")
-            s_found = True
-        elif suffix in past_verbal_s_2:
-            verbal = True
-            if suffix == "\u0646\u0627":  # نا
-                info.append("s: 1st pl m/f past")
-                s_found = True
-            elif suffix == "\u062a\u0645":  # تم
-                info.append("s: 2nd p m past")
-                s_found = True
-            elif suffix == "\u062a\u0646":  # تن
-                info.append("s: 2nd p f past")
-                s_found = True
-            elif suffix == "\u062a\u0627":  # تا
-                info.append("s: 3rd du f past")
-                s_found = True
-            elif suffix == "\u0648\u0627":  # وا
-                info.append("s: 3rd pl m past")
-                s_found = True
-        elif suffix in past_verbal_s_1:
-            verbal = True
-            if suffix == "\u062a":  # ت
-                info.append("s: 1st s m/f past OR 2nd s m/f past OR 3rd s f past")
-                s_found = True
-            elif suffix == "\u0627":  # ا
-                info.append("s: 3rd du m past")
-                s_found = True
-            elif suffix == "\u0646":  # ن
-                info.append("s: 3rd pl f")
-                s_found = True
-    return p_found, s_found, verbal
+    elif suffix in PAST_SUFFIX_TAGS:
+        verbal = True
+        tags.append(PAST_SUFFIX_TAGS[suffix])
+        s_found = True
+
+    if not p_found and prefix in PREFIX_TAGS:
+        tags.append(PREFIX_TAGS[prefix])
+
+    if not s_found:
+        tag = (OBJECT_SUFFIX_TAGS if verbal else POSSESSIVE_SUFFIX_TAGS).get(suffix)
+        if tag is not None:
+            tags.append(tag)
+
+    if not tags:
+        tags.append(TAG_CODES[NO_INFO])
+    return tuple(tags)
+
+
+"""segment() commits to one reading of each word, always taking the longest
+prefix and the first length one affix it finds. The n-best mode below keeps
+the other readings: every prefix of the prefix trie is combined with every
+suffix of the suffix trie around a root of at least MIN_ROOT_LEN letters"""
+MIN_ROOT_LEN = 3
+DEFAULT_NBEST = 5
+
+
+def lattice_splits(word):
+    """every (prefix len, suffix len) split of a devocalized word allowed by the
+    tries. Each trie is walked once and its matches shared by every split, so
+    a word has at most 4 x 4 of them"""
+    prefix_lens = [0] + trie_matches(PREFIX_TRIE, word, 3)
+    suffix_lens = [0] + trie_matches(SUFFIX_TRIE, reversed(word), 3)
+    return [(p, s) for p in prefix_lens for s in suffix_lens if len(word) - p - s >= MIN_ROOT_LEN]
+
+
+def rank_candidates(word):
+    """the analyses of every split of a devocalized word, segment()'s own first
+    and the rest ordered by the number of affixes given a meaning, then by the
+    number of letters in the affixes, then by the length of the prefix"""
+    greedy = segment_devocalized(word) if METRICS is None else segment(word)
+    seen = {greedy}
+    ranked = []
+    for p, s in lattice_splits(word):
+        split = word[:p], word[p:len(word) - s], word[len(word) - s:]
+        if split not in seen:
+            seen.add(split)
+            # the tags of each (prefix, suffix) pair are looked up once in ANALYZE_CACHE
+            analysis = analyze_compact(*split)
+            informative = sum(tag != TAG_CODES[NO_INFO] for tag in analysis.tags)
+            ranked.append(((-informative, -p - s, -p), analysis))
+    ranked.sort(key=lambda candidate: candidate[0])
+    return [analyze_compact(*greedy)] + [analysis for _, analysis in ranked]
+
+
+def analyze_nbest(word, k=DEFAULT_NBEST):
+    """the k best analyses of a word as a list of Analysis, the first being
+    analyze_compact(*segment(word)). A word has at most 16 candidates, so the
+    cost of keeping them all is bounded and k only cuts the list returned"""
+    word = remove_vocalization(word)
+    candidates = NBEST_CACHE.get(word)
+    if candidates is None:
+        candidates = rank_candidates(word)
+        NBEST_CACHE.put(word, candidates)
+    return candidates[:k]
+
+
+def is_word(token):
+    """a token is a word if it has any letter or digit, which rules out
+    punctuation and tokens made only of vocalization marks or tatweel"""
+    return any(ch.isalnum() for ch in remove_vocalization(token))
+
+
+"""a token is a run of word characters, which may carry vocalization marks
+(Arabic and Quranic annotation signs) anywhere inside of it. Runs with no
+letter or digit are dropped by is_word() afterwards, as requiring one in
+the pattern makes it backtrack quadratically on long runs without any"""
+TOKEN_PATTERN = re.compile(r"(?:\w|[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED])+")
+
+
+def regex_tokenize(text):
+    """yields (token, start offset) for each word in text"""
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if is_word(token):
+            yield token, match.start()
+
+
+def nltk_tokenize(text):
+    """yields (token, start offset) for each word found by NLTK's
+    wordpunct tokenizer, NLTK is only imported on first use"""
+    from nltk.tokenize import WordPunctTokenizer
+    for start, end in WordPunctTokenizer().span_tokenize(text):
+        token = text[start:end]
+        if is_word(token):
+            yield token, start
+
+
+TOKENIZERS = {'regex': regex_tokenize, 'nltk': nltk_tokenize}
+
+
+def tokenize(text, backend='regex'):
+    """yields (token, start offset) for each word of text, skipping
+    punctuation and tokens made only of vocalization marks"""
+    return TOKENIZERS[backend](text)
+
+
+def analyze_stream(lines, backend='regex'):
+    """lazily analyzes an iterable of text lines (e.g. an open file), yielding
+    a (token, analysis) pair for each word, only one line is held at a time"""
+    for line in lines:
+        for token, _ in tokenize(line, backend):
+            yield token, analyze(*segment(token))
+
+
+class Span(namedtuple('Span', 'text start prefix_end suffix_start end tags')):
+    """a segmented word given as offsets into the text it was found in:
+    text[start:prefix_end] is its prefix, text[prefix_end:suffix_start] its
+    root and text[suffix_start:end] its suffix, vocalization included.
+    Substrings are only made when one of the properties is read"""
+    __slots__ = ()
+
+    @property
+    def token(self):
+        return self.text[self.start:self.end]
+
+    @property
+    def prefix(self):
+        return self.text[self.start:self.prefix_end]
+
+    @property
+    def root(self):
+        return self.text[self.prefix_end:self.suffix_start]
+
+    @property
+    def suffix(self):
+        return self.text[self.suffix_start:self.end]
+
+    @property
+    def info(self):
+        return [TAG_NAMES[tag] for tag in self.tags]
+
+
+def source_offsets(token, word):
+    """maps each position of word, the normalized form of token, to the
+    offset in token of the letter it came from; vocalization marks stay
+    attached to the letter before them. The first entry is 0 and the last
+    len(token), so that marks or tatweel at either end belong to the word"""
+    if len(word) == len(token) and not NORMALIZATION[1]:
+        return range(len(token) + 1)
+    offsets = []
+    for i, ch in enumerate(token):
+        offsets.extend([i] * len(ch.translate(NORMALIZATION_TABLE)))
+    offsets[:1] = [0]
+    offsets.append(len(token))
+    return offsets
+
+
+def segment_spans(text, backend='regex'):
+    """yields a Span for each word of text, the prefix and suffix boundaries
+    being the lengths of the prefix and suffix found by segment(). In its
+    rare cases where the segments do not tile the word (such as the ال
+    moved after the و of 'and'), the spans still tile it. A boundary
+    falling between the two letters of a split lam-alef ligature is moved
+    before the ligature"""
+    for token, start in tokenize(text, backend):
+        word = remove_vocalization(token)
+        prefix, root, suffix = segment_devocalized(word) if METRICS is None else segment(token)
+        offsets = source_offsets(token, word)
+        prefix_end = len(prefix)
+        suffix_start = max(prefix_end, len(word) - len(suffix))
+        yield Span(text, start, start + offsets[prefix_end], start + offsets[suffix_start], start + len(token),
+                   analyze_compact(prefix, root, suffix).tags)
+
+
+def analyze_file(path, encoding='utf-8', backend='regex'):
+    """analyze_stream() over the lines of a text file"""
+    with open(path, encoding=encoding) as f:
+        yield from analyze_stream(f, backend)
+
+
+def analyze_chunk(lines):
+    """analyzes a list of lines, returning a list of (token, analysis) pairs
+    for each line. This is the unit of work sent to each worker process"""
+    return [list(analyze_stream([line])) for line in lines]
+
+
+def analyze_parallel(lines, workers=None, chunksize=500):
+    """analyzes an iterable of lines across a pool of worker processes,
+    yielding the same per-line lists as analyze_chunk() in input order.
+
+    lines are sent to the workers chunksize at a time to keep the cost of
+    passing them between processes low, and only 2 chunks per worker are
+    in flight at once so that memory stays bounded on large inputs"""
+    # imported here as it is slow to import and only needed for this mode
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    lines = iter(lines)
+    pending = deque()
+    with ProcessPoolExecutor(workers) as executor:
+        while True:
+            chunk = list(islice(lines, chunksize))
+            if chunk:
+                pending.append(executor.submit(analyze_chunk, chunk))
+            if pending and (not chunk or len(pending) >= 2 * workers):
+                yield from pending.popleft().result()
+            elif not chunk:
+                break
+
+# article 1 of the Universal Declaration of Human Rights, used as sample text
+UDHR_ARTICLE_1 = "يولد جميع الناس أحراراً متساوين في الكرامة والحقوق. وقد وهبوا عقلاً وضميراً وعليهم ان يعامل بعضهم " \
+                 "بعضاً بروح اﻹخاء. "
 
 
 if __name__ == '__main__':
@@ -431,20 +861,14 @@ if __name__ == '__main__':
     print(analyze(*segment("جدته")))  # his grandmother
     print(analyze(*segment("اليوم")))  # today/the day
     print(analyze(*segment("للدرس")))  # to the lesson
+    print([analysis.as_list() for analysis in analyze_nbest("يُريدكم")])  # every reading of he likes you all
 
-    v = ["\u064B", "\u064C", "\u064D", "\u064E", "\u064F", "\u0650", "\u0652", "\u0670", "\u0651", '.']
-    arabic_text = "يولد جميع الناس أحراراً متساوين في الكرامة والحقوق. وقد وهبوا عقلاً وضميراً وعليهم ان يعامل بعضهم " \
-                  "بعضاً بروح اﻹخاء. "
-    seg = wordpunct_tokenize(arabic_text)
-    for i in seg:
-        """ check if the unit is actually a word"""
-        if i not in v:
-            print(i, "\n", str(analyze(*segment(i))))
+    for token, analysis in analyze_stream([UDHR_ARTICLE_1]):
+        print(token, "\n", str(analysis))
 
 """
-    next steps could include getting functionality for the digraph "lam+alif",
-    trying to account for the accusative indefinite case marker which is identical
-    to some verbal affixes (especially in the case that we are removing all 
+    next steps could include trying to account for the accusative indefinite
+    case marker which is identical to some verbal affixes (especially in the case that we are removing all 
     vocalization/case type units) and is extremely common in written arabic, 
     and developing measures of success on hand annotated data(f1, etc)
     
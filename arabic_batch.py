@@ -0,0 +1,228 @@
+"""
+    NumPy batch engine for the affixational FST. A list of words is encoded
+    as a 2-D uint16 array of code points with a vector of lengths, and every
+    step of segment() is applied to all of the words at once as array
+    operations: the normalization of remove_vocalization(), the affix table
+    matches of find_long_affix() and find_affix_len_1() and the positional
+    pattern checks of check_pattern().
+
+    the result is a set of index vectors into each normalized word, which
+    starts at `starts` in the concatenation of all of them, `normalized`:
+
+        word   = normalized[starts:starts + lengths]
+        prefix = WAW * waw + word[:prefix_end]
+        root   = word[root_start:root_end]
+        suffix = word[suffix_start:suffix_end]
+
+    which reproduce segment() exactly, including the cases in which its
+    segments overlap. Words the arrays can't represent (longer than
+    MAX_WIDTH, outside the Basic Multilingual Plane, holding a lone
+    surrogate, or with a lam-alef ligature to split) are flagged in `fallback` and left to segment().
+    Requires NumPy.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import arabic_affixational_FST as fst
+
+MAX_WIDTH = 48
+WAW = 'و'
+DELETE = -1
+EXPAND = -2
+
+BatchSegments = namedtuple('BatchSegments', 'words fallback waw prefix_end root_start root_end '
+                                            'suffix_start suffix_end normalized starts lengths')
+
+
+def affix_keys(affixes):
+    """packs each affix into one integer, 16 bits per letter, first letter highest"""
+    keys = []
+    for affix in affixes:
+        key = 0
+        for ch in affix:
+            key = key << 16 | ord(ch)
+        keys.append(key)
+    return np.array(sorted(keys), dtype=np.int64)
+
+
+PREFIX_3_KEYS = affix_keys(fst.PREFIX_LEN_3)
+PREFIX_2_KEYS = affix_keys(fst.PREFIX_LEN_2)
+SUFFIX_3_KEYS = affix_keys(fst.SUFFIX_LEN_3)
+SUFFIX_2_KEYS = affix_keys(fst.SUFFIX_LEN_2)
+
+
+def letter_lut(letters):
+    """a bool per code point, true for the given letters"""
+    lut = np.zeros(1 << 16, dtype=bool)
+    lut[[ord(ch) for ch in letters]] = True
+    return lut
+
+
+PREFIX_1_LUT = letter_lut(fst.PREFIX_LEN_1)
+SUFFIX_1_LUT = letter_lut(fst.SUFFIX_LEN_1)
+
+
+def pattern_masks():
+    """for each word len of PATTERN_TABLES, a uint8 per code point with bit j
+    set if that letter at position j marks a derived pattern"""
+    masks = np.zeros((max(fst.PATTERN_TABLES) + 1, 1 << 16), dtype=np.uint8)
+    for length, positions in fst.PATTERN_TABLES.items():
+        for j, letters in enumerate(positions):
+            for ch in letters:
+                masks[length, ord(ch)] |= 1 << j
+    return masks
+
+
+PATTERN_MASKS = pattern_masks()
+
+
+def normalization_lut():
+    """fst.NORMALIZATION_TABLE as an array indexed by code point, holding the
+    replacement code point, DELETE, or EXPAND for one to many mappings"""
+    lut = np.arange(1 << 16, dtype=np.int32)
+    for code, value in fst.NORMALIZATION_TABLE.items():
+        if code < 1 << 16:
+            if value is None or value == '':
+                lut[code] = DELETE
+            elif len(value) == 1:
+                lut[code] = ord(value)
+            else:
+                lut[code] = EXPAND
+    return lut
+
+
+def encode(words):
+    """returns (codes, lengths, fallback, normalized): the normalized words as
+    a 2-D array of code points padded with zeros, their lengths, the words
+    that couldn't be encoded, and the normalized words concatenated into
+    one string"""
+    n = len(words)
+    raw_lengths = np.fromiter(map(len, words), dtype=np.int64, count=n)
+    data = np.frombuffer(''.join(words).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    rows = np.repeat(np.arange(n), raw_lengths)
+    fallback = np.zeros(n, dtype=bool)
+    fallback[rows[(data > 0xFFFF) | ((data >= 0xD800) & (data <= 0xDFFF))]] = True
+
+    # normalize all the characters at once, then squeeze out the deleted ones
+    normalized = normalization_lut()[np.minimum(data, 0xFFFF)]
+    fallback[rows[normalized == EXPAND]] = True
+    keep = normalized >= 0
+    rows = rows[keep]
+    normalized = normalized[keep]
+    lengths = np.bincount(rows, minlength=n)
+    fallback |= lengths > MAX_WIDTH
+
+    width = int(min(lengths.max(initial=1), MAX_WIDTH))
+    cols = np.arange(len(rows)) - (np.cumsum(lengths) - lengths)[rows]
+    inside = cols < width
+    codes = np.zeros((n, max(width, 1)), dtype=np.uint16)
+    codes[rows[inside], cols[inside]] = normalized[inside]
+    text = normalized.astype(np.uint32).tobytes().decode('utf-32-le', 'surrogatepass')
+    return codes, lengths, fallback, text
+
+
+def segment_indices(words):
+    """segments a list of words at once, returning a BatchSegments of index vectors"""
+    words = list(words)
+    codes, n, fallback, normalized = encode(words)
+    rows = np.arange(len(words))
+    last = codes.shape[1] - 1
+
+    def at(positions):
+        return codes[rows, np.clip(positions, 0, last)]
+
+    def key(*positions):
+        packed = np.zeros(len(words), dtype=np.int64)
+        for p in positions:
+            packed = packed << 16 | at(p).astype(np.int64)
+        return packed
+
+    zero = np.zeros(len(words), dtype=np.int64)
+    waw_code = ord(WAW)
+
+    # find_long_affix, for words longer than 3
+    active = n > 3
+    p3 = active & (n >= 6) & np.isin(key(zero, zero + 1, zero + 2), PREFIX_3_KEYS)
+    p2 = active & (n >= 5) & ~p3 & np.isin(key(zero, zero + 1), PREFIX_2_KEYS)
+    prefix_end = np.where(p3, 3, np.where(p2, 2, 0))
+    root_start = prefix_end.copy()
+    root_end = np.where(prefix_end > 0, n, 0)
+    suffix_start = zero.copy()
+    suffix_end = zero.copy()
+
+    for size, keys, min_len in [(3, SUFFIX_3_KEYS, 6), (2, SUFFIX_2_KEYS, 5)]:
+        match = active & (n >= min_len) & (suffix_end == suffix_start) & \
+            np.isin(key(*[n - k for k in range(size, 0, -1)]), keys)
+        has_root = root_end > root_start
+        new_start = np.where(has_root, root_start, 0)
+        new_end = np.where(has_root, np.maximum(root_start, root_end - size), n - size)
+        new_suffix_start = np.where(has_root, np.maximum(new_start, new_end - size), n - size)
+        new_suffix_end = np.where(has_root, new_end, n)
+        root_start = np.where(match, new_start, root_start)
+        root_end = np.where(match, new_end, root_end)
+        suffix_start = np.where(match, new_suffix_start, suffix_start)
+        suffix_end = np.where(match, new_suffix_end, suffix_end)
+
+    waw = active & (root_end - root_start >= 4) & (at(root_start) == waw_code) & (at(root_start + 1) == waw_code)
+    root_start = root_start + waw
+    leading_waw = active & ~waw & (n >= 4) & (at(zero) == waw_code) & (at(zero + 1) == waw_code)
+    prefix_end = np.where(leading_waw, 1, prefix_end)
+    root_start = np.where(leading_waw, 1, root_start)
+    root_end = np.where(leading_waw, n, root_end)
+    no_root = root_end == root_start
+    root_start = np.where(no_root, 0, root_start)
+    root_end = np.where(no_root, n, root_end)
+
+    # find_short_affix
+    def affix_len_1(apply, original_len, prefix_end, root_start, root_end, suffix_start, suffix_end):
+        strip_suffix = apply & (suffix_end == suffix_start) & SUFFIX_1_LUT[at(root_end - 1)]
+        suffix_start = np.where(strip_suffix, root_end - 1, suffix_start)
+        suffix_end = np.where(strip_suffix, root_end, suffix_end)
+        root_end = root_end - strip_suffix
+        strip_prefix = apply & (root_end - root_start == original_len) & ~waw & (prefix_end == 0) & \
+            PREFIX_1_LUT[at(root_start)]
+        prefix_end = np.where(strip_prefix, 1, prefix_end)
+        root_start = root_start + strip_prefix
+        return prefix_end, root_start, root_end, suffix_start, suffix_end
+
+    length = root_end - root_start
+    seven = active & (length == 7)
+    segments = affix_len_1(seven, 7, prefix_end, root_start, root_end, suffix_start, suffix_end)
+    prefix_end, root_start, root_end, suffix_start, suffix_end = segments
+
+    new_length = root_end - root_start
+    checked = active & ((seven & (new_length == 6)) | (~seven & (length >= 4) & (length <= 6)))
+    check_length = np.where(checked, new_length, 0)
+    pattern = np.zeros(len(words), dtype=bool)
+    for j in range(6):
+        letter_mask = PATTERN_MASKS[check_length, at(root_start + j)]
+        pattern |= (j < check_length) & ((letter_mask >> j) & 1).astype(bool)
+    pattern |= (check_length == 6) & (at(root_start + 2) == at(root_start + 4))
+    segments = affix_len_1(checked & ~pattern, check_length, prefix_end, root_start, root_end,
+                           suffix_start, suffix_end)
+    prefix_end, root_start, root_end, suffix_start, suffix_end = segments
+
+    starts = np.cumsum(n) - n
+    return BatchSegments(words, fallback, waw, prefix_end, root_start, root_end, suffix_start, suffix_end,
+                         normalized, starts, n)
+
+
+def segment_batch(words):
+    """segment() over a list of words, returning a list of (prefix, root, suffix)"""
+    batch = segment_indices(words)
+    text = batch.normalized
+    starts = batch.starts
+
+    # the substrings are cut straight out of the normalized text, at offsets from its start
+    def cut(begin, end):
+        return [text[i:j] for i, j in zip((starts + begin).tolist(), (starts + end).tolist())]
+
+    results = list(zip(cut(0, batch.prefix_end), cut(batch.root_start, batch.root_end),
+                       cut(batch.suffix_start, batch.suffix_end)))
+    for i in np.flatnonzero(batch.waw & ~batch.fallback).tolist():
+        prefix, root, suffix = results[i]
+        results[i] = WAW + prefix, root, suffix
+    for i in np.flatnonzero(batch.fallback).tolist():
+        results[i] = fst.segment(batch.words[i])
+    return results
@@ -0,0 +1,329 @@
+"""
+    Bulk analysis of large corpora with the affixational FST. Takes any
+    number of files and directories (searched recursively, in sorted order),
+    which may be gzip (.gz) or bzip2 (.bz2) compressed, reads them in large
+    chunks of whole lines and writes one analysis per token as:
+
+        jsonl     {"token": ..., "prefix": ..., "root": ..., "suffix": ..., "info": [...]}
+        tsv       token, prefix, root, suffix and the info joined by ' | '
+        parquet   a directory of part-NNNNN.parquet files, see arabic_columnar.py
+        arrow     the same as Arrow IPC files
+
+    every --checkpoint-mb of input the output is flushed to disk and the
+    position reached (input file, byte offset into its uncompressed text,
+    size of the output or number of parts) is saved to OUTPUT.checkpoint. If
+    the job is stopped, running the same command again truncates the output
+    to the last checkpoint and carries on from there. Progress and
+    throughput are reported on stderr every --progress seconds.
+
+        python arabic_bulk.py archive/ -o analyses.tsv --format tsv
+        python arabic_bulk.py 2015.txt.gz 2016.txt.gz -o analyses --format parquet
+"""
+import argparse
+import bz2
+import codecs
+import fnmatch
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+import arabic_affixational_FST as fst
+
+FORMATS = ('jsonl', 'tsv', 'parquet', 'arrow')
+CHUNK_SIZE = 8 << 20
+CHECKPOINT_SIZE = 64 << 20
+CHECKPOINT_VERSION = 1
+# formatted lines held by TextOutput before they are written to the file
+BUFFER_LINES = 65536
+
+
+def find_inputs(paths, pattern='*'):
+    """the files named by paths, directories being walked for files whose name
+    matches pattern. Raises ValueError if there are none"""
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for directory, _, names in os.walk(path):
+                found += [os.path.join(directory, name) for name in names if fnmatch.fnmatch(name, pattern)]
+            inputs += sorted(found)
+        elif os.path.isfile(path):
+            inputs.append(path)
+        else:
+            raise FileNotFoundError("no such file or directory: %r" % path)
+    if not inputs:
+        raise ValueError("no input files matching %r in %s" % (pattern, ', '.join(paths)))
+    return inputs
+
+
+def open_input(path, chunk_size=CHUNK_SIZE):
+    """returns (raw, stream): the file on disk, whose position tells how much of
+    it has been read, and a buffered reader of its uncompressed bytes"""
+    raw = open(path, 'rb')
+    if path.endswith('.gz'):
+        return raw, io.BufferedReader(gzip.GzipFile(fileobj=raw), chunk_size)
+    if path.endswith('.bz2'):
+        return raw, io.BufferedReader(bz2.BZ2File(raw), chunk_size)
+    return raw, io.BufferedReader(raw, chunk_size)
+
+
+def read_chunks(path, offset=0, chunk_size=CHUNK_SIZE):
+    """yields (lines, offset, position) for each chunk of about chunk_size bytes
+    of whole lines of a file, starting offset bytes into its uncompressed
+    text: the lines as bytes, the offset just past them and the position
+    reached in the file on disk"""
+    raw, stream = open_input(path, chunk_size)
+    with raw, stream:
+        if offset:
+            # seeking a compressed stream decompresses everything up to offset
+            stream.seek(offset)
+        while True:
+            lines = stream.readlines(chunk_size)
+            if not lines:
+                break
+            offset += sum(map(len, lines))
+            yield lines, offset, raw.tell()
+
+
+def check_encoding(encoding):
+    """raises ValueError unless encoding writes a newline as the single byte
+    b'\\n', as lines are split before they are decoded (so UTF-16 and UTF-32
+    text has to be converted first)"""
+    try:
+        encoder = codecs.getincrementalencoder(encoding)()
+    except LookupError:
+        raise ValueError("unknown encoding: %r" % encoding)
+    # the first call may add a byte order mark
+    encoder.encode('a')
+    if encoder.encode('\n') != b'\n':
+        raise ValueError("encoding %r is not supported, its newline is not the byte 0x0a" % encoding)
+
+
+def format_jsonl(token, analysis):
+    return json.dumps({'token': token, 'prefix': analysis.prefix, 'root': analysis.root,
+                       'suffix': analysis.suffix, 'info': analysis.info}, ensure_ascii=False) + '\n'
+
+
+def format_tsv(token, analysis):
+    return '\t'.join([token, analysis.prefix, analysis.root, analysis.suffix, ' | '.join(analysis.info)]) + '\n'
+
+
+class TextOutput(object):
+    """JSON lines or TSV output to one file, which is truncated to the size
+    recorded by the checkpoint when resuming. Lines are written out every
+    BUFFER_LINES tokens, only checkpoints wait for them to reach the disk"""
+
+    def __init__(self, path, format, state=None):
+        self.format = format_jsonl if format == 'jsonl' else format_tsv
+        if state:
+            self.file = open(path, 'r+b')
+            self.file.truncate(state['size'])
+            self.file.seek(state['size'])
+        else:
+            self.file = open(path, 'wb')
+        self.buffer = []
+
+    def write(self, token, analysis):
+        self.buffer.append(self.format(token, analysis))
+        if len(self.buffer) >= BUFFER_LINES:
+            self.flush()
+
+    def flush(self):
+        self.file.write(''.join(self.buffer).encode('utf-8'))
+        self.buffer = []
+
+    def checkpoint(self):
+        """makes everything written so far durable, returning the state to resume from"""
+        self.flush()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'size': self.file.tell()}
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class ColumnarOutput(object):
+    """Parquet or Arrow IPC output to a directory, one part file per
+    checkpoint; parts written after the last checkpoint are removed when
+    resuming"""
+
+    def __init__(self, path, format, state=None, batch_size=None):
+        import arabic_columnar
+
+        self.columnar = arabic_columnar
+        self.path = path
+        self.format = format
+        self.batch_size = batch_size or arabic_columnar.DEFAULT_BATCH_SIZE
+        self.part = state['parts'] if state else 0
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith('part-') and name.endswith('.' + format):
+                if int(name[5:-len(format) - 1]) >= self.part:
+                    os.remove(os.path.join(path, name))
+        self.builder = None
+        self.writer = None
+
+    def write(self, token, analysis):
+        if self.builder is None:
+            self.builder = self.columnar.ColumnBuilder(keep_dictionaries=self.format == 'arrow')
+            self.writer = self.columnar.open_writer(
+                os.path.join(self.path, 'part-%05d.%s' % (self.part, self.format)), self.format)
+        self.builder.append(token, analysis)
+        if len(self.builder) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.builder is not None and len(self.builder):
+            self.writer.write_batch(self.builder.to_arrow())
+            self.builder.reset()
+
+    def checkpoint(self):
+        """closes the current part, returning the state to resume from"""
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+            self.builder = self.writer = None
+            self.part += 1
+        return {'parts': self.part}
+
+    def close(self):
+        self.checkpoint()
+
+
+def open_output(path, format, state=None):
+    if format in ('jsonl', 'tsv'):
+        return TextOutput(path, format, state)
+    if format in ('parquet', 'arrow'):
+        return ColumnarOutput(path, format, state)
+    raise ValueError("unknown output format %r, expected one of %s" % (format, ', '.join(FORMATS)))
+
+
+def load_checkpoint(path, inputs, format):
+    """the saved state of an interrupted job, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError("%s is not a version %d checkpoint" % (path, CHECKPOINT_VERSION))
+    if state['inputs'] != inputs or state['format'] != format:
+        raise ValueError("%s was saved by a job with other inputs or another format, "
+                         "use --restart to start over" % path)
+    return state
+
+
+def save_checkpoint(path, state):
+    """writes the state to a temporary file which then replaces the checkpoint,
+    so that a crash leaves either the old or the new checkpoint"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+class Progress(object):
+    """reports how far a job has got on stderr, at most once per interval seconds"""
+
+    def __init__(self, inputs, interval=10.0, stream=sys.stderr):
+        self.sizes = [os.path.getsize(path) for path in inputs]
+        self.interval = interval
+        self.stream = stream
+        self.start = self.last = time.perf_counter()
+        self.tokens = 0
+        self.bytes = 0
+
+    def update(self, index, position, tokens, n_bytes, force=False):
+        """index and position are the input file and the position in it, tokens
+        and n_bytes the tokens and uncompressed bytes analyzed since the last update"""
+        self.tokens += tokens
+        self.bytes += n_bytes
+        now = time.perf_counter()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+        elapsed = max(now - self.start, 1e-9)
+        done = sum(self.sizes[:index]) + min(position, self.sizes[index] if index < len(self.sizes) else 0)
+        print("file %d/%d  %5.1f%%  %d tokens  %.0f tokens/s  %.1f MB/s" %
+              (min(index + 1, len(self.sizes)), len(self.sizes), 100.0 * done / max(sum(self.sizes), 1),
+               self.tokens, self.tokens / elapsed, self.bytes / elapsed / 1e6), file=self.stream)
+
+
+def run(inputs, output, format='jsonl', chunk_size=CHUNK_SIZE, checkpoint_size=CHECKPOINT_SIZE,
+        encoding='utf-8', errors='strict', restart=False, progress=10.0):
+    """analyzes every token of the input files into output, resuming from
+    output.checkpoint if there is one. Returns the number of tokens analyzed
+    over the whole job, including earlier interrupted runs"""
+    check_encoding(encoding)
+    checkpoint_path = output + '.checkpoint'
+    state = None if restart else load_checkpoint(checkpoint_path, inputs, format)
+    if state is None:
+        state = {'version': CHECKPOINT_VERSION, 'inputs': inputs, 'format': format, 'file': 0, 'offset': 0,
+                 'tokens': 0, 'output': None}
+    elif progress:
+        print("resuming %s at file %d, byte %d" % (output, state['file'] + 1, state['offset']), file=sys.stderr)
+    out = open_output(output, format, state['output'])
+    report = Progress(inputs, progress) if progress else None
+    try:
+        unsaved = 0
+        for index in range(state['file'], len(inputs)):
+            position = 0
+            for lines, offset, position in read_chunks(inputs[index], state['offset'], chunk_size):
+                tokens = 0
+                for line in lines:
+                    for token, _ in fst.tokenize(line.decode(encoding, errors)):
+                        out.write(token, fst.analyze_compact(*fst.segment(token)))
+                        tokens += 1
+                unsaved += offset - state['offset']
+                state['offset'] = offset
+                state['tokens'] += tokens
+                if unsaved >= checkpoint_size:
+                    state['output'] = out.checkpoint()
+                    save_checkpoint(checkpoint_path, state)
+                    unsaved = 0
+                if report:
+                    report.update(index, position, tokens, sum(map(len, lines)))
+            state['file'] = index + 1
+            state['offset'] = 0
+            state['output'] = out.checkpoint()
+            save_checkpoint(checkpoint_path, state)
+            unsaved = 0
+        if report:
+            report.update(len(inputs), 0, 0, 0, force=True)
+    finally:
+        out.close()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return state['tokens']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="resumable bulk analysis of files and directories")
+    parser.add_argument('inputs', nargs='+', help="text files, optionally .gz or .bz2, or directories of them")
+    parser.add_argument('-o', '--output', required=True, help="output file, or directory for parquet/arrow")
+    parser.add_argument('--format', choices=FORMATS, default='jsonl')
+    parser.add_argument('--pattern', default='*', help="names of the files to take from directories")
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--errors', default='strict', help="how to handle undecodable bytes, e.g. 'replace'")
+    parser.add_argument('--chunk-mb', type=float, default=CHUNK_SIZE / (1 << 20), help="size of each read")
+    parser.add_argument('--checkpoint-mb', type=float, default=CHECKPOINT_SIZE / (1 << 20),
+                        help="input read between checkpoints")
+    parser.add_argument('--progress', type=float, default=10.0, help="seconds between reports, 0 for none")
+    parser.add_argument('--restart', action='store_true', help="ignore any checkpoint and start over")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    options = parse_args()
+    try:
+        n_tokens = run(find_inputs(options.inputs, options.pattern), options.output, options.format,
+                       int(options.chunk_mb * (1 << 20)), int(options.checkpoint_mb * (1 << 20)),
+                       options.encoding, options.errors, options.restart, options.progress)
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+    print("%d tokens written to %s" % (n_tokens, options.output))
@@ -0,0 +1,159 @@
+"""
+    Columnar output for the affixational FST. Instead of one
+    [prefix, root, suffix, info] list per token, analyses are written
+    straight into column buffers:
+
+        token, prefix, root, suffix   dictionary encoded strings (int32 codes)
+        tags                          a list of uint8 codes into TAG_NAMES per token
+
+    each Parquet row group carries the dictionaries of its own batch only, so
+    memory is bounded by the batch size. Arrow IPC files can only extend a
+    dictionary from one batch to the next, so for them the dictionaries are
+    kept across batches and each batch ships the strings it adds as a
+    delta; memory then grows with the number of distinct strings.
+    Columns can be read as NumPy arrays or as Arrow record batches, and
+    written to Arrow IPC or Parquet files one batch (row group) at a time:
+
+        python arabic_columnar.py corpus.txt analyses.parquet
+
+    NumPy is needed for to_numpy() and pyarrow for everything Arrow/Parquet.
+"""
+import json
+import sys
+from array import array
+
+import arabic_affixational_FST as fst
+
+STRING_COLUMNS = ('token', 'prefix', 'root', 'suffix')
+DEFAULT_BATCH_SIZE = 65536
+
+
+class ColumnBuilder(object):
+    """accumulates analyses as columns, one batch at a time"""
+
+    def __init__(self, keep_dictionaries=False):
+        self.keep_dictionaries = keep_dictionaries
+        self.codes = dict((name, {}) for name in STRING_COLUMNS)
+        self.values = dict((name, []) for name in STRING_COLUMNS)
+        # the Arrow dictionaries built by to_arrow() so far, extended with each batch's new values
+        self.dictionaries = dict((name, None) for name in STRING_COLUMNS)
+        self.reset()
+
+    def reset(self):
+        """starts a new batch, with new dictionaries unless keep_dictionaries is set"""
+        if not self.keep_dictionaries:
+            for name in STRING_COLUMNS:
+                self.codes[name].clear()
+                self.values[name].clear()
+        self.indices = dict((name, array('i')) for name in STRING_COLUMNS)
+        self.tag_offsets = array('i', [0])
+        self.tag_values = array('B')
+
+    def __len__(self):
+        return len(self.indices['token'])
+
+    def append(self, token, analysis):
+        for name, value in zip(STRING_COLUMNS, (token, analysis.prefix, analysis.root, analysis.suffix)):
+            codes = self.codes[name]
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(codes)
+                self.values[name].append(value)
+            self.indices[name].append(code)
+        self.tag_values.extend(analysis.tags)
+        self.tag_offsets.append(len(self.tag_values))
+
+    def to_numpy(self):
+        """the current batch as a dict of NumPy arrays: <column>_codes and
+        <column>_values for each string column, tag_offsets and tag_values.
+        The values are those of the batch, or of every batch so far if
+        keep_dictionaries is set"""
+        import numpy as np
+
+        # copied out of the buffers so that they can still grow afterwards
+        columns = {}
+        for name in STRING_COLUMNS:
+            columns[name + '_codes'] = np.frombuffer(bytes(self.indices[name]), dtype=np.int32)
+            columns[name + '_values'] = np.array(self.values[name], dtype=str)
+        columns['tag_offsets'] = np.frombuffer(bytes(self.tag_offsets), dtype=np.int32)
+        columns['tag_values'] = np.frombuffer(bytes(self.tag_values), dtype=np.uint8)
+        return columns
+
+    def to_arrow(self):
+        """the current batch as a pyarrow.RecordBatch with arrow_schema()"""
+        import pyarrow as pa
+
+        def buffer_array(values, data_type):
+            return pa.Array.from_buffers(data_type, len(values), [None, pa.py_buffer(bytes(values))])
+
+        arrays = []
+        for name in STRING_COLUMNS:
+            dictionary = self.dictionaries[name]
+            if dictionary is None or not self.keep_dictionaries:
+                dictionary = pa.array(self.values[name], pa.string())
+            elif len(dictionary) < len(self.values[name]):
+                # only the strings added since the last batch are converted
+                dictionary = pa.concat_arrays([dictionary, pa.array(self.values[name][len(dictionary):],
+                                                                    pa.string())])
+            if self.keep_dictionaries:
+                self.dictionaries[name] = dictionary
+            arrays.append(pa.DictionaryArray.from_arrays(buffer_array(self.indices[name], pa.int32()), dictionary))
+        arrays.append(pa.ListArray.from_arrays(buffer_array(self.tag_offsets, pa.int32()),
+                                               buffer_array(self.tag_values, pa.uint8())))
+        return pa.record_batch(arrays, schema=arrow_schema())
+
+
+def arrow_schema():
+    """the schema of the columns, with TAG_NAMES stored in its metadata under b'tag_names'"""
+    import pyarrow as pa
+
+    fields = [pa.field(name, pa.dictionary(pa.int32(), pa.string())) for name in STRING_COLUMNS]
+    fields.append(pa.field('tags', pa.list_(pa.uint8())))
+    return pa.schema(fields, metadata={b'tag_names': json.dumps(fst.TAG_NAMES).encode('utf-8')})
+
+
+def column_batches(lines, batch_size=DEFAULT_BATCH_SIZE, keep_dictionaries=False):
+    """analyzes an iterable of text lines, yielding a ColumnBuilder every
+    batch_size tokens (and once for the rest), which is reset after use"""
+    builder = ColumnBuilder(keep_dictionaries)
+    for line in lines:
+        for token, _ in fst.tokenize(line):
+            builder.append(token, fst.analyze_compact(*fst.segment(token)))
+            if len(builder) >= batch_size:
+                yield builder
+                builder.reset()
+    if len(builder):
+        yield builder
+
+
+def open_writer(path, format='parquet'):
+    """a writer of arrow_schema() record batches to an Arrow IPC ('arrow') or Parquet ('parquet') file"""
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(path, schema)
+    elif format == 'arrow':
+        return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+    raise ValueError("unknown columnar format %r, expected 'parquet' or 'arrow'" % format)
+
+
+def write_columns(lines, path, format='parquet', batch_size=DEFAULT_BATCH_SIZE):
+    """analyzes an iterable of text lines into an Arrow IPC ('arrow') or
+    Parquet ('parquet') file, writing one record batch or row group per
+    batch_size tokens. Returns the number of tokens written"""
+    n_tokens = 0
+    with open_writer(path, format) as writer:
+        for builder in column_batches(lines, batch_size, keep_dictionaries=format == 'arrow'):
+            n_tokens += len(builder)
+            writer.write_batch(builder.to_arrow())
+    return n_tokens
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit("usage: python arabic_columnar.py corpus.txt output.(parquet|arrow)")
+    output_format = 'arrow' if sys.argv[2].endswith(('.arrow', '.feather', '.ipc')) else 'parquet'
+    with open(sys.argv[1], encoding='utf-8') as corpus:
+        print("%d tokens written to %s" % (write_columns(corpus, sys.argv[2], output_format), sys.argv[2]))
@@ -0,0 +1,189 @@
+"""
+    A precomputed lexicon for the affixational FST. For a fixed vocabulary
+    segment() and analyze() always give the same answer, so they can be run
+    once over a word list and their results written to a compact binary file:
+
+        python arabic_lexicon.py wordlist.txt lexicon.bin
+
+    the file is opened with mmap, so that looking up a known word costs one
+    hash probe with no load time, and the pages are shared by every process
+    that opens it. Words missing from the lexicon fall back to the FST.
+
+    layout (little-endian): a 32 byte header holding a magic string, the
+    format version, the number of entries and the offset and length of a
+    JSON trailer. The trailer holds the affix strings, the tag sets, the
+    normalization the lexicon was built with and the offset of each of the
+    sections below, which are 8 byte aligned arrays:
+        slots         uint32 open addressing hash table, entry index + 1 (0 is empty)
+        key_offsets   uint32 n + 1 offsets of the UTF-8 keys into keys
+        root_offsets  uint32 n + 1 offsets of the UTF-8 roots into roots
+        prefix_ids    uint16 index of the prefix in the affix strings
+        suffix_ids    uint16 index of the suffix in the affix strings
+        tagset_ids    uint16 index of the tags in the tag sets
+        keys, roots   the UTF-8 encoded keys (devocalized words) and roots
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from zlib import crc32
+
+import arabic_affixational_FST as fst
+
+MAGIC = b'AFSTLEX\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQ')
+
+
+def build_lexicon(words, path):
+    """analyzes every distinct devocalized form of words and writes the results
+    to a lexicon file at path, returning the number of entries"""
+    if sys.byteorder != 'little':
+        raise ValueError("lexicon files can only be built on little-endian machines")
+    keys = []
+    seen = set()
+    for word in words:
+        key = fst.remove_vocalization(word)
+        if key and key not in seen:
+            seen.add(key)
+            keys.append(key)
+
+    affixes = {'': 0}
+    tagsets = {}
+    key_offsets, root_offsets = array('I', [0]), array('I', [0])
+    prefix_ids, suffix_ids, tagset_ids = array('H'), array('H'), array('H')
+    key_blob, root_blob = bytearray(), bytearray()
+    for key in keys:
+        analysis = fst.analyze_compact(*fst.segment(key))
+        key_blob += key.encode('utf-8')
+        key_offsets.append(len(key_blob))
+        root_blob += analysis.root.encode('utf-8')
+        root_offsets.append(len(root_blob))
+        prefix_ids.append(affixes.setdefault(analysis.prefix, len(affixes)))
+        suffix_ids.append(affixes.setdefault(analysis.suffix, len(affixes)))
+        tagset_ids.append(tagsets.setdefault(analysis.tags, len(tagsets)))
+
+    n_slots = 1
+    while n_slots < 2 * len(keys):
+        n_slots *= 2
+    slots = array('I', bytes(4 * n_slots))
+    for i in range(len(keys)):
+        slot = crc32(key_blob[key_offsets[i]:key_offsets[i + 1]]) & (n_slots - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (n_slots - 1)
+        slots[slot] = i + 1
+
+    sections = {}
+    with open(path, 'wb') as f:
+        f.write(bytes(HEADER.size))
+        for name, data in [('slots', slots), ('key_offsets', key_offsets), ('root_offsets', root_offsets),
+                           ('prefix_ids', prefix_ids), ('suffix_ids', suffix_ids), ('tagset_ids', tagset_ids),
+                           ('keys', key_blob), ('roots', root_blob)]:
+            f.write(bytes(-f.tell() % 8))
+            data = bytes(data)
+            sections[name] = [f.tell(), len(data)]
+            f.write(data)
+        meta = json.dumps({'n_slots': n_slots, 'sections': sections,
+                           'affixes': sorted(affixes, key=affixes.get),
+                           'tagsets': [list(tags) for tags in sorted(tagsets, key=tagsets.get)],
+                           'tag_names': fst.TAG_NAMES,
+                           'normalization': list(fst.NORMALIZATION)}).encode('utf-8')
+        meta_offset = f.tell()
+        f.write(meta)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys), meta_offset, len(meta)))
+    return len(keys)
+
+
+class Lexicon(object):
+    """a lexicon file opened read-only with mmap"""
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("lexicon files can only be read on little-endian machines")
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_entries, meta_offset, meta_len = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a version %d lexicon file" % (path, VERSION))
+        meta = json.loads(self.mmap[meta_offset:meta_offset + meta_len].decode('utf-8'))
+        if meta['tag_names'] != fst.TAG_NAMES:
+            raise ValueError("%s was built with different morphological tags" % path)
+        if tuple(meta['normalization']) != fst.NORMALIZATION:
+            raise ValueError("%s was built with set_normalization%r, the FST uses set_normalization%r" %
+                             (path, tuple(meta['normalization']), fst.NORMALIZATION))
+        self.mask = meta['n_slots'] - 1
+        self.affixes = [sys.intern(affix) for affix in meta['affixes']]
+        self.tagsets = [tuple(tags) for tags in meta['tagsets']]
+
+        view = memoryview(self.mmap)
+        sections = dict((name, view[offset:offset + length]) for name, (offset, length) in meta['sections'].items())
+        self.slots = sections['slots'].cast('I')
+        self.key_offsets = sections['key_offsets'].cast('I')
+        self.root_offsets = sections['root_offsets'].cast('I')
+        self.prefix_ids = sections['prefix_ids'].cast('H')
+        self.suffix_ids = sections['suffix_ids'].cast('H')
+        self.tagset_ids = sections['tagset_ids'].cast('H')
+        self.keys = sections['keys']
+        self.roots = sections['roots']
+
+    def __len__(self):
+        return self.n_entries
+
+    def __contains__(self, word):
+        return self.find(fst.remove_vocalization(word).encode('utf-8')) >= 0
+
+    def find(self, key):
+        """returns the entry index of a UTF-8 encoded devocalized word, or -1"""
+        slot = crc32(key) & self.mask
+        while True:
+            entry = self.slots[slot] - 1
+            if entry < 0:
+                return -1
+            if self.keys[self.key_offsets[entry]:self.key_offsets[entry + 1]] == key:
+                return entry
+            slot = (slot + 1) & self.mask
+
+    def lookup(self, word):
+        """the Analysis of a word if it is in the lexicon, otherwise None"""
+        entry = self.find(fst.remove_vocalization(word).encode('utf-8'))
+        if entry < 0:
+            return None
+        root = str(self.roots[self.root_offsets[entry]:self.root_offsets[entry + 1]], 'utf-8')
+        return fst.Analysis(self.affixes[self.prefix_ids[entry]], root, self.affixes[self.suffix_ids[entry]],
+                            self.tagsets[self.tagset_ids[entry]])
+
+    def analyze(self, word):
+        """the Analysis of a word, from the lexicon if it is known and from the FST otherwise"""
+        analysis = self.lookup(word)
+        if analysis is None:
+            analysis = fst.analyze_compact(*fst.segment(word))
+        return analysis
+
+    def close(self):
+        for name in ['slots', 'key_offsets', 'root_offsets', 'prefix_ids', 'suffix_ids', 'tagset_ids',
+                     'keys', 'roots']:
+            getattr(self, name).release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_word_list(path, encoding='utf-8'):
+    """yields the first field of each line of a word list, e.g. 'word' or 'word<TAB>count'"""
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            fields = line.split()
+            if fields:
+                yield fields[0]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit("usage: python arabic_lexicon.py wordlist.txt lexicon.bin")
+    print("%d entries written to %s" % (build_lexicon(read_word_list(sys.argv[1]), sys.argv[2]), sys.argv[2]))
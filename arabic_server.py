@@ -0,0 +1,328 @@
+"""
+    asyncio analysis service for the affixational FST. Clients send one JSON
+    object per line and get one back per request:
+
+        -> {"id": 1, "text": "والكتب"}
+        <- {"id": 1, "analyses": [["والكتب", "وال", "كتب", "", ["p: and + def"]]]}
+
+    each analysis is [token, prefix, root, suffix, info], one per word of
+    the text. Requests arriving together are gathered into micro-batches
+    (up to --max-batch texts, waiting at most --max-delay-ms for more) and
+    analyzed at once, optionally on a pool of worker processes. At most
+    --max-pending requests are queued: past that the server stops reading
+    from its clients until the queue drains. A request longer than
+    --max-line-bytes is skipped and answered with an error.
+
+        python arabic_server.py serve --port 8765
+        python arabic_server.py serve --unix /tmp/arabic.sock --processes 8
+        python arabic_server.py serve --stdio
+        python arabic_server.py loadtest --port 8765 --connections 64 --requests 100000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import arabic_affixational_FST as fst
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_LINE_BYTES = 1 << 20
+
+
+def analyze_batch(texts):
+    """analyzes a list of texts, the unit of work of a micro-batch"""
+    results = []
+    for text in texts:
+        results.append([[token] + fst.analyze(*fst.segment(token)) for token, _ in fst.tokenize(text)])
+    return results
+
+
+class MicroBatcher(object):
+    """gathers texts submitted concurrently into batches for analyze_batch()"""
+
+    def __init__(self, max_batch_size=256, max_delay=0.002, max_pending=10000, executor=None, concurrency=1):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue(max_pending)
+        self.executor = executor
+        self.slots = asyncio.Semaphore(concurrency)
+        # asyncio only keeps weak references to tasks, the running dispatches are kept here
+        self.dispatches = set()
+        self.batches = 0
+        self.texts = 0
+
+    async def submit(self, text):
+        """queues a text, waiting for room if the queue is full, and returns its analyses"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        return await future
+
+    async def collect(self):
+        """waits for a request, then gathers more until the batch is full or max_delay has passed"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        while True:
+            batch = await self.collect()
+            await self.slots.acquire()
+            task = asyncio.get_running_loop().create_task(self.dispatch(batch))
+            self.dispatches.add(task)
+            task.add_done_callback(self.dispatches.discard)
+
+    async def close(self):
+        """waits for the batches being analyzed, whose executor jobs can't be cancelled"""
+        if self.dispatches:
+            await asyncio.gather(*self.dispatches, return_exceptions=True)
+
+    async def dispatch(self, batch):
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, analyze_batch, [text for text, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            self.batches += 1
+            self.texts += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.slots.release()
+
+
+async def handle_connection(batcher, reader, writer, max_in_flight=64):
+    """answers the JSON lines requests of one client, which may pipeline up to
+    max_in_flight requests; answers come back as they are ready, matched by id"""
+    in_flight = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+
+    async def answer(request_id, text):
+        try:
+            response = {'id': request_id, 'analyses': await batcher.submit(text)}
+        except Exception as error:
+            response = {'id': request_id, 'error': str(error)}
+        finally:
+            in_flight.release()
+        writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    try:
+        while True:
+            line = await reader.read_line()
+            if line is None:
+                writer.write(json.dumps({'id': None, 'error': "request too long"}).encode('utf-8') + b'\n')
+                await writer.drain()
+                continue
+            if not line:
+                break
+            if not line.strip():
+                continue
+            request = None
+            try:
+                request = json.loads(line)
+                request_id, text = request.get('id'), request.get('text')
+                if text is None:
+                    raise ValueError("missing 'text'")
+                if not isinstance(text, str):
+                    raise ValueError("'text' must be a string")
+            except (ValueError, AttributeError) as error:
+                # the id of a request that is a JSON object is echoed, so that the client can match the error
+                response = {'id': request.get('id') if isinstance(request, dict) else None,
+                            'error': "bad request: %s" % error}
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+                continue
+            await in_flight.acquire()
+            task = asyncio.get_running_loop().create_task(answer(request_id, text))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        writer.close()
+
+
+class LineReader(object):
+    """reads the lines of an asyncio.StreamReader, whose limit bounds their length"""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    async def read_line(self):
+        """the next line, b'' at the end of the stream, or None for a line
+        longer than the limit, the rest of which is skipped"""
+        try:
+            return await self.reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as error:
+            return error.partial
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+        while True:
+            # the bytes consumed are already buffered, the newline may still be to come
+            await self.reader.readexactly(consumed)
+            try:
+                await self.reader.readuntil(b'\n')
+                return None
+            except asyncio.IncompleteReadError:
+                return None
+            except asyncio.LimitOverrunError as error:
+                consumed = error.consumed
+
+
+class StdinReader(object):
+    """reads the standard input on a thread, as it may be a file that asyncio can't wait on"""
+
+    def __init__(self, limit=DEFAULT_MAX_LINE_BYTES):
+        self.limit = limit
+
+    def read_line_blocking(self):
+        line = sys.stdin.buffer.readline(self.limit + 1)
+        if len(line) <= self.limit or line.endswith(b'\n'):
+            return line
+        while line and not line.endswith(b'\n'):
+            line = sys.stdin.buffer.readline(self.limit)
+        return None
+
+    async def read_line(self):
+        """as LineReader.read_line()"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.read_line_blocking)
+
+
+class StdoutWriter(object):
+    """writes to the standard output, flushing it on drain()"""
+
+    def write(self, data):
+        sys.stdout.buffer.write(data)
+
+    async def drain(self):
+        sys.stdout.buffer.flush()
+
+    def close(self):
+        sys.stdout.buffer.flush()
+
+
+async def serve(host='127.0.0.1', port=DEFAULT_PORT, path=None, stdio=False, processes=0, max_batch_size=256,
+                max_delay=0.002, max_pending=10000, max_in_flight=64, max_line_bytes=DEFAULT_MAX_LINE_BYTES):
+    """runs the service on stdio, a Unix socket at path, or TCP host:port until cancelled"""
+    executor = None
+    if processes:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(processes)
+    batcher = MicroBatcher(max_batch_size, max_delay, max_pending, executor, max(processes, 1))
+    batching = asyncio.get_running_loop().create_task(batcher.run())
+
+    def connected(reader, writer):
+        return handle_connection(batcher, LineReader(reader), writer, max_in_flight)
+
+    try:
+        if stdio:
+            await handle_connection(batcher, StdinReader(max_line_bytes), StdoutWriter(), max_in_flight)
+            return
+        if path:
+            server = await asyncio.start_unix_server(connected, path, limit=max_line_bytes)
+        else:
+            server = await asyncio.start_server(connected, host, port, limit=max_line_bytes)
+        print("serving on %s" % (path or "%s:%d" % (host, port)), file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+    finally:
+        batching.cancel()
+        await asyncio.gather(batching, return_exceptions=True)
+        await batcher.close()
+        if executor:
+            executor.shutdown()
+
+
+async def load_test(host='127.0.0.1', port=DEFAULT_PORT, path=None, connections=16, requests=10000, texts=None):
+    """sends requests from many concurrent connections, one request in flight
+    per connection, returning throughput and latency percentiles"""
+    texts = texts or [token for token, _ in fst.tokenize(fst.UDHR_ARTICLE_1)]
+    latencies = []
+    tokens = [0]
+
+    async def client(n):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        for i in range(n):
+            text = texts[(n + i) % len(texts)]
+            start = time.perf_counter()
+            writer.write(json.dumps({'id': i, 'text': text}, ensure_ascii=False).encode('utf-8') + b'\n')
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            if 'error' in response:
+                raise RuntimeError(response['error'])
+            tokens[0] += len(response['analyses'])
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(requests // connections + (i < requests % connections))
+                           for i in range(connections)])
+    elapsed = time.perf_counter() - start
+    centiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {'requests': len(latencies), 'seconds': elapsed, 'requests_per_sec': len(latencies) / elapsed,
+            'tokens_per_sec': tokens[0] / elapsed, 'p50_ms': centiles[49] * 1000, 'p90_ms': centiles[89] * 1000,
+            'p99_ms': centiles[98] * 1000}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="asyncio analysis service for the affixational FST")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name in ['serve', 'loadtest']:
+        command = commands.add_parser(name)
+        command.add_argument('--host', default='127.0.0.1')
+        command.add_argument('--port', type=int, default=DEFAULT_PORT)
+        command.add_argument('--unix', help="path of a Unix socket to use instead of TCP")
+    serve_command = commands.choices['serve']
+    serve_command.add_argument('--stdio', action='store_true', help="serve the standard input and output")
+    serve_command.add_argument('--processes', type=int, default=0,
+                               help="analyze batches on this many worker processes (default: in a thread)")
+    serve_command.add_argument('--max-batch', type=int, default=256, help="most texts in a micro-batch")
+    serve_command.add_argument('--max-delay-ms', type=float, default=2.0,
+                               help="longest a request waits for its micro-batch to fill")
+    serve_command.add_argument('--max-pending', type=int, default=10000,
+                               help="most queued requests before clients are no longer read from")
+    serve_command.add_argument('--max-in-flight', type=int, default=64,
+                               help="most unanswered requests per connection")
+    serve_command.add_argument('--max-line-bytes', type=int, default=DEFAULT_MAX_LINE_BYTES,
+                               help="longest request line accepted")
+    load_command = commands.choices['loadtest']
+    load_command.add_argument('--connections', type=int, default=16)
+    load_command.add_argument('--requests', type=int, default=10000)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    options = parse_args()
+    if options.command == 'serve':
+        try:
+            asyncio.run(serve(options.host, options.port, options.unix, options.stdio, options.processes,
+                              options.max_batch, options.max_delay_ms / 1000, options.max_pending,
+                              options.max_in_flight, options.max_line_bytes))
+        except KeyboardInterrupt:
+            pass
+    else:
+        results = asyncio.run(load_test(options.host, options.port, options.unix, options.connections,
+                                        options.requests))
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,113 @@
+"""
+    Type level analysis of a corpus. segment() and analyze() only depend on
+    the devocalized form of a token, so a corpus can be analyzed in two
+    passes: the first counts its distinct devocalized forms (types), each
+    type is then analyzed once, possibly across several processes, and the
+    second pass either expands the analyses back into token order or the
+    counts are written out as a type frequency table:
+
+        python arabic_types.py corpus.txt --table types.tsv
+        python arabic_types.py archive/ --expand analyses.tsv --workers 8
+
+    inputs are read as by arabic_bulk.py (directories, .gz and .bz2), and
+    the type/token ratio is reported on stderr.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+import arabic_affixational_FST as fst
+import arabic_bulk
+
+
+def count_types(lines, backend='regex'):
+    """counts the devocalized form of every token of an iterable of lines, in one streaming pass"""
+    counts = Counter()
+    for line in lines:
+        counts.update(fst.remove_vocalization(token) for token, _ in fst.tokenize(line, backend))
+    return counts
+
+
+def analyze_types(types):
+    """the Analysis of each of a list of types, the unit of work sent to each worker process"""
+    return [fst.analyze_compact(*fst.segment(word)) for word in types]
+
+
+def analyze_type_table(types, workers=1, chunksize=5000):
+    """returns a dict of the Analysis of every type, analyzed across a pool of
+    worker processes, chunksize types at a time, if workers is more than 1"""
+    types = list(types)
+    if workers <= 1:
+        return dict(zip(types, analyze_types(types)))
+    from concurrent.futures import ProcessPoolExecutor
+    chunks = [types[i:i + chunksize] for i in range(0, len(types), chunksize)]
+    table = {}
+    with ProcessPoolExecutor(workers) as executor:
+        for chunk, analyses in zip(chunks, executor.map(analyze_types, chunks)):
+            table.update(zip(chunk, analyses))
+    return table
+
+
+def expand(lines, table, backend='regex'):
+    """yields (token, Analysis) for every token of lines, in order, from a
+    table of analyses covering every type of lines"""
+    for line in lines:
+        for token, _ in fst.tokenize(line, backend):
+            yield token, table[fst.remove_vocalization(token)]
+
+
+def type_frequencies(counts, table):
+    """yields (type, count, Analysis) for every type, most frequent first"""
+    for word, count in counts.most_common():
+        yield word, count, table[word]
+
+
+def read_lines(inputs, encoding='utf-8', errors='strict'):
+    """yields the decoded lines of a list of files, read as by arabic_bulk.read_chunks()"""
+    arabic_bulk.check_encoding(encoding)
+    for path in inputs:
+        for lines, _, _ in arabic_bulk.read_chunks(path):
+            for line in lines:
+                yield line.decode(encoding, errors)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="analyze each distinct word of a corpus once")
+    parser.add_argument('inputs', nargs='+', help="text files, optionally .gz or .bz2, or directories of them")
+    outputs = parser.add_mutually_exclusive_group(required=True)
+    outputs.add_argument('--table', help="write a TSV of type, count, prefix, root, suffix and info")
+    outputs.add_argument('--expand', help="write a TSV of token, prefix, root, suffix and info in token order")
+    parser.add_argument('--workers', type=int, default=1, help="processes analyzing the types, 0 for one per CPU")
+    parser.add_argument('--pattern', default='*', help="names of the files to take from directories")
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--errors', default='strict', help="how to handle undecodable bytes, e.g. 'replace'")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    options = parse_args()
+    try:
+        inputs = arabic_bulk.find_inputs(options.inputs, options.pattern)
+        start = time.perf_counter()
+        counts = count_types(read_lines(inputs, options.encoding, options.errors))
+        counted = time.perf_counter()
+        table = analyze_type_table(counts, options.workers or os.cpu_count() or 1)
+        analyzed = time.perf_counter()
+        if options.table:
+            with open(options.table, 'w', encoding='utf-8') as out:
+                for word, count, analysis in type_frequencies(counts, table):
+                    out.write('\t'.join([word, str(count), analysis.prefix, analysis.root, analysis.suffix,
+                                          ' | '.join(analysis.info)]) + '\n')
+        else:
+            with open(options.expand, 'w', encoding='utf-8') as out:
+                for token, analysis in expand(read_lines(inputs, options.encoding, options.errors), table):
+                    out.write(arabic_bulk.format_tsv(token, analysis))
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+    n_tokens = sum(counts.values())
+    print("%d tokens, %d types, type/token ratio %.4f: %.1fx fewer analyses" %
+          (n_tokens, len(counts), len(counts) / max(n_tokens, 1), n_tokens / max(len(counts), 1)), file=sys.stderr)
+    print("counting %.2fs, analyzing %.2fs, writing %.2fs" %
+          (counted - start, analyzed - counted, time.perf_counter() - analyzed), file=sys.stderr)
@@ -0,0 +1,423 @@
+"""
+    benchmarks for the affixational FST. Run as a script:
+
+        python benchmark.py stages --tokens 1000000 --json results.json --baseline baseline.json
+        python benchmark.py [tries|parallel|import|patterns|batch] --tokens 1000000
+
+    see python benchmark.py --help for the corpus options. The synthetic
+    corpus is built by attaching the affixes of the FST to random consonant
+    stems, so that every branch of the affix matching is exercised, and the
+    frequency of its words follows a Zipf law of configurable skew
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import arabic_affixational_FST as fst
+
+LETTERS = [chr(c) for c in range(0x0628, 0x063B)] + [chr(c) for c in range(0x0641, 0x064B)]
+
+
+def make_corpus(n_tokens, vocab_size=50000, skew=1.0, seed=0):
+    """returns a list of n_tokens words drawn from a random vocabulary, the
+    word of rank r having a frequency proportional to 1 / r ** skew (so a
+    skew of 0 draws every word equally often)"""
+    rng = random.Random(seed)
+    prefixes = [''] * 4 + fst.PREFIX_LEN_3 + fst.PREFIX_LEN_2 + fst.PREFIX_LEN_1
+    suffixes = [''] * 4 + fst.SUFFIX_LEN_3 + fst.SUFFIX_LEN_2 + fst.SUFFIX_LEN_1
+    vocab = [rng.choice(prefixes) + ''.join(rng.choice(LETTERS) for _ in range(rng.randint(2, 6))) +
+             rng.choice(suffixes) for _ in range(vocab_size)]
+    weights = list(itertools.accumulate(1 / rank ** skew for rank in range(1, vocab_size + 1)))
+    return rng.choices(vocab, cum_weights=weights, k=n_tokens)
+
+
+def make_udhr_corpus(n_tokens):
+    """returns n_tokens words of the sample text of the FST, repeated as often as needed"""
+    words = [token for token, _ in fst.tokenize(fst.UDHR_ARTICLE_1)]
+    return list(itertools.islice(itertools.cycle(words), n_tokens))
+
+
+def linear_find_long_affix(input_word):
+    """the list scanning version of find_long_affix, kept as a reference"""
+    root = ''
+    prefix = ''
+    suffix = ''
+    if len(input_word) >= 6:
+        for p3 in fst.PREFIX_LEN_3:
+            if input_word.startswith(p3):
+                root = input_word[3:]
+                prefix = input_word[:3]
+    if len(input_word) >= 5 and not prefix:
+        for p2 in fst.PREFIX_LEN_2:
+            if input_word.startswith(p2):
+                root = input_word[2:]
+                prefix = input_word[:2]
+    if len(input_word) >= 6:
+        for s3 in fst.SUFFIX_LEN_3:
+            if input_word.endswith(s3):
+                if root:
+                    root = root[:-3]
+                    suffix = root[-3:]
+                else:
+                    root = input_word[:-3]
+                    suffix = input_word[-3:]
+    if len(input_word) >= 5 and not suffix:
+        for s2 in fst.SUFFIX_LEN_2:
+            if input_word.endswith(s2):
+                if root:
+                    root = root[:-2]
+                    suffix = root[-2:]
+                else:
+                    root = input_word[:-2]
+                    suffix = input_word[-2:]
+    if len(root) >= 4 and root[:2] == 'وو':
+        prefix = 'و' + prefix
+        root = root[1:]
+    elif len(input_word) >= 4 and input_word[:2] == 'وو':
+        prefix = 'و'
+        root = input_word[1:]
+    if not root:
+        root = input_word
+    return prefix, root, suffix
+
+
+def linear_find_affix_len_1(prefix, root, suffix, original_root_len):
+    """the list scanning version of find_affix_len_1, kept as a reference"""
+    for s1 in fst.SUFFIX_LEN_1:
+        if root.endswith(s1) and not suffix:
+            suffix = root[-1] + suffix
+            root = root[:-1]
+            break
+    if len(root) == original_root_len:
+        for p1 in fst.PREFIX_LEN_1:
+            if root.startswith(p1) and not prefix:
+                prefix = prefix + root[0]
+                root = root[1:]
+                break
+    return prefix, root, suffix
+
+
+def linear_is_pattern(root):
+    """the boolean chains of check_len_4, check_len_5 and check_len_6, kept as a reference"""
+    if len(root) == 4:
+        return not (root[0] != '\u0645'
+                    and root[1] != '\u0627'
+                    and root[2] not in ['\u0627', '\u0648', '\u064A']
+                    and root[3] != '\u0629')
+    if len(root) == 5:
+        len_five_patterns = {0: ['\u0627', '\u062a'], 1: ['\u0627', '\u064a', '\u0648'],
+                             2: ['\u0627', '\u062a', '\u0645'], 3: ['\u0645', '\u064a', '\u062a'],
+                             4: ['\u0645', '\u062a'], 5: ['\u0627', '\u0648'], 6: ['\u0627', '\u0645']}
+        return not ((root[2] not in len_five_patterns[0] and root[0] != '\u0627')
+                     and (root[3] not in len_five_patterns[1] and root[0] != '\u0645')
+                     and (root[0] not in len_five_patterns[2] and root[4] != '\u0629')
+                     and (root[0] not in len_five_patterns[3] and root[2] != '\u062A')
+                     and (root[0] not in len_five_patterns[4] and root[2] != '\u0627')
+                     and (root[2] not in len_five_patterns[5] and root[4] != '\u0629')
+                     and (root[0] not in len_five_patterns[6] and root[1] != '\u0646')
+                     and (root[3] != '\u0627' and root[0] != '\u0627')
+                     and (root[4] != '\u0646' and root[3] != '\u0627')
+                     and (root[3] != '\u064A' and root[0] != '\u062A')
+                     and (root[3] != '\u0648' and root[1] != '\u0627')
+                     and (root[2] != '\u0627' and root[1] != '\u0648')
+                     and (root[3] != '\u0626' and root[2] != '\u0627')
+                     and (root[4] != '\u0629' and root[1] != '\u0627')
+                     and (root[4] != '\u064A' and root[2] != '\u0627'))
+    return not (not root.startswith('\u0627\u0633\u062a')
+                and not root.startswith('\u0645\u0633\u062a')
+                and (root[0] != '\u0645' and root[3] != '\u0627' and root[5] != '\u0629')
+                and (root[0] != '\u0627' and root[2] != '\u062A' and root[4] != '\u0627')
+                and (root[0] != '\u0627' and root[3] != '\u0648' and root[2] != root[4])
+                and (root[0] != '\u062A' and root[2] != '\u0627' and root[4] != '\u064A'))
+
+
+def check(agrees, what):
+    """exits with an error if an equivalence check failed, unlike assert this also runs under python -O"""
+    if not agrees:
+        sys.exit("mismatch: %s" % what)
+
+
+def first_difference(expected, got):
+    """the index of the first item of two lists that differs, for error messages"""
+    return next((i for i, (a, b) in enumerate(zip(expected, got)) if a != b), min(len(expected), len(got)))
+
+
+def time_per_word(func, args):
+    """returns the mean time in nanoseconds of calling func on each argument tuple"""
+    start = time.perf_counter()
+    for a in args:
+        func(*a)
+    return (time.perf_counter() - start) / len(args) * 1e9
+
+
+def bench_affix_tries(corpus):
+    """compares the trie based affix matching against the linear list scans"""
+    words = [(fst.remove_vocalization(w),) for w in corpus]
+    roots = [('', w, '', len(w)) for (w,) in words]
+    for (w,) in words:
+        check(linear_find_long_affix(w) == fst.find_long_affix(w), "find_long_affix(%r)" % w)
+    for r in roots:
+        check(linear_find_affix_len_1(*r) == fst.find_affix_len_1(*r), "find_affix_len_1%r" % (r,))
+
+    for name, linear, trie, args in [('find_long_affix', linear_find_long_affix, fst.find_long_affix, words),
+                                     ('find_affix_len_1', linear_find_affix_len_1, fst.find_affix_len_1, roots)]:
+        before = time_per_word(linear, args)
+        after = time_per_word(trie, args)
+        print("%-18s linear %7.1f ns/word  trie %7.1f ns/word  speedup %.2fx" % (name, before, after, before / after))
+
+
+def bench_patterns(corpus):
+    """proves is_pattern() equal to the boolean chains it replaced and compares their speed.
+
+    the chains only ever compare a letter against the letters below or
+    against another letter of the word, so checking every word of length
+    4 to 6 over those letters plus two others covers every case"""
+    letters = sorted(set(''.join(''.join(p) for p in fst.PATTERN_LETTERS.values()) + '\u0627\u0633\u062a\u0628\u062c'))
+    for length in fst.PATTERN_TABLES:
+        count = 0
+        for root in map(''.join, itertools.product(letters, repeat=length)):
+            check(linear_is_pattern(root) == fst.is_pattern(root), "is_pattern(%r)" % root)
+            count += 1
+        print("len %d: is_pattern agrees on all %d words over %d letters" % (length, count, len(letters)))
+
+    roots = [(w,) for w in map(fst.remove_vocalization, corpus) if len(w) in fst.PATTERN_TABLES]
+    before = time_per_word(linear_is_pattern, roots)
+    after = time_per_word(fst.is_pattern, roots)
+    print("is_pattern chains %7.1f ns/word  tables %7.1f ns/word  speedup %.2fx" % (before, after, before / after))
+
+
+def bench_batch(corpus):
+    """compares the NumPy batch engine against calling segment() on each word"""
+    import arabic_batch
+
+    fst.set_cache_size(0)
+    start = time.perf_counter()
+    scalar = [fst.segment(w) for w in corpus]
+    before = time.perf_counter() - start
+    start = time.perf_counter()
+    arabic_batch.segment_indices(corpus)
+    indices = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = arabic_batch.segment_batch(corpus)
+    strings = time.perf_counter() - start
+    fst.set_cache_size(fst.DEFAULT_CACHE_SIZE)
+    if batch != scalar:
+        i = first_difference(scalar, batch)
+        check(False, "segment_batch gives %r for %r, segment() %r" % (batch[i], corpus[i], scalar[i]))
+    print("segment()       %10.0f tokens/s" % (len(corpus) / before))
+    print("segment_indices %10.0f tokens/s  speedup %.2fx" % (len(corpus) / indices, before / indices))
+    print("segment_batch   %10.0f tokens/s  speedup %.2fx" % (len(corpus) / strings, before / strings))
+
+
+def bench_nbest(corpus, ks=(1, 3, 5)):
+    """compares analyze_nbest() against analyze(*segment()), whose answer must come first"""
+    fst.set_cache_size(0)
+    start = time.perf_counter()
+    best = [fst.analyze_compact(*fst.segment(w)) for w in corpus]
+    base = len(corpus) / (time.perf_counter() - start)
+    print("segment + analyze %10.0f tokens/s" % base)
+    for k in ks:
+        start = time.perf_counter()
+        nbest = [fst.analyze_nbest(w, k) for w in corpus]
+        rate = len(corpus) / (time.perf_counter() - start)
+        first = [candidates[0] for candidates in nbest]
+        if first != best:
+            i = first_difference(best, first)
+            check(False, "analyze_nbest(%r)[0] is %r, analyze %r" % (corpus[i], first[i], best[i]))
+        print("analyze_nbest k=%d %10.0f tokens/s  %.2f candidates/token  cost %.2fx" %
+              (k, rate, sum(map(len, nbest)) / len(corpus), base / rate))
+    fst.set_cache_size(fst.DEFAULT_CACHE_SIZE)
+
+
+def bench_types(corpus):
+    """compares analyzing every token against analyzing each type once and expanding"""
+    import arabic_types
+
+    lines = make_lines(corpus)
+    for cache_size in (0, fst.DEFAULT_CACHE_SIZE):
+        fst.set_cache_size(cache_size)
+        fst.clear_caches()
+        start = time.perf_counter()
+        tokens = [(token, fst.analyze_compact(*fst.segment(token))) for line in lines
+                  for token, _ in fst.tokenize(line)]
+        before = time.perf_counter() - start
+        fst.clear_caches()
+        start = time.perf_counter()
+        counts = arabic_types.count_types(lines)
+        table = arabic_types.analyze_type_table(counts)
+        expanded = list(arabic_types.expand(lines, table))
+        after = time.perf_counter() - start
+        if expanded != tokens:
+            i = first_difference(tokens, expanded)
+            check(False, "token %d: expanded %r, per token %r" % (i, expanded[i:i + 1], tokens[i:i + 1]))
+        print("cache %5d  per token %10.0f tokens/s  per type %10.0f tokens/s  speedup %.2fx" %
+              (cache_size, len(corpus) / before, len(corpus) / after, before / after))
+    print("%d tokens, %d types, type/token ratio %.4f" % (len(corpus), len(counts), len(counts) / len(corpus)))
+
+
+def make_lines(corpus, line_len=20):
+    """groups a corpus of tokens into lines of line_len space separated words"""
+    return [' '.join(corpus[i:i + line_len]) for i in range(0, len(corpus), line_len)]
+
+
+def bench_parallel(corpus, worker_counts=(1, 2, 4, 8, 16, 32), chunksize=500):
+    """reports the throughput of analyze_parallel() as the number of workers grows"""
+    lines = make_lines(corpus)
+    fst.clear_caches()
+    start = time.perf_counter()
+    serial = fst.analyze_chunk(lines)
+    base = len(corpus) / (time.perf_counter() - start)
+    print("serial     %10.0f tokens/s" % base)
+    for workers in worker_counts:
+        fst.clear_caches()
+        start = time.perf_counter()
+        parallel = list(fst.analyze_parallel(lines, workers, chunksize))
+        rate = len(corpus) / (time.perf_counter() - start)
+        if parallel != serial:
+            i = first_difference(serial, parallel)
+            check(False, "line %d with %d workers: %r, serial %r" % (i, workers, parallel[i:i + 1], serial[i:i + 1]))
+        print("%2d workers %10.0f tokens/s  scaling %.2fx" % (workers, rate, rate / base))
+
+
+def import_time(statement, runs):
+    """returns the median wall time in milliseconds of running statement in a fresh interpreter"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', statement])
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def bench_import(corpus=None, runs=20, max_ms=50.0):
+    """measures how long importing the module adds to interpreter start up,
+    exiting with an error if it is more than max_ms"""
+    base = import_time('pass', runs)
+    cost = import_time('import arabic_affixational_FST', runs) - base
+    print("import arabic_affixational_FST %.1f ms (interpreter start up %.1f ms)" % (cost, base))
+    if cost > max_ms:
+        sys.exit("import time regression: %.1f ms > %.1f ms" % (cost, max_ms))
+
+
+def stage_inputs(corpus):
+    """runs the corpus through the pipeline of segment() and analyze(),
+    returning the argument tuples each stage receives"""
+    words = [fst.remove_vocalization(w) for w in corpus]
+    long_affixes = [fst.find_long_affix(w) if len(w) > 3 else ('', w, '') for w in words]
+    short_affixes = [fst.find_short_affix(*a) if len(w) > 3 else a for w, a in zip(words, long_affixes)]
+    return [('remove_vocalization', fst.remove_vocalization, [(w,) for w in corpus]),
+            ('find_long_affix', fst.find_long_affix, [(w,) for w in words if len(w) > 3]),
+            ('find_short_affix', fst.find_short_affix, [a for w, a in zip(words, long_affixes) if len(w) > 3]),
+            ('analyze', fst.analyze, short_affixes)]
+
+
+def time_stage(func, args):
+    """calls func once per argument tuple, returning tokens per second and
+    latency percentiles in nanoseconds"""
+    clock = time.perf_counter_ns
+    latencies = []
+    for a in args:
+        start = clock()
+        func(*a)
+        latencies.append(clock() - start)
+    total = sum(latencies)
+    centiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {'calls': len(args), 'tokens_per_sec': len(args) / total * 1e9 if total else float('inf'),
+            'mean_ns': total / len(args), 'p50_ns': centiles[49], 'p90_ns': centiles[89], 'p99_ns': centiles[98]}
+
+
+# results are only comparable if these match
+COMPARABLE_FIELDS = ['corpus', 'python', 'caches']
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """returns a message for each stage whose throughput fell more than threshold
+    (a fraction) below the one recorded in the baseline results. Raises
+    ValueError if the baseline was recorded on another corpus, Python or
+    cache setting"""
+    for field in COMPARABLE_FIELDS:
+        if results.get(field) != baseline.get(field):
+            raise ValueError("the baseline was recorded with %s %s, this run has %s %s" %
+                             (field, json.dumps(baseline.get(field)), field, json.dumps(results.get(field))))
+    regressions = []
+    for stage, stats in results['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before and stats['tokens_per_sec'] < before['tokens_per_sec'] * (1 - threshold):
+            regressions.append("%s: %.0f tokens/s, baseline %.0f tokens/s" %
+                               (stage, stats['tokens_per_sec'], before['tokens_per_sec']))
+    return regressions
+
+
+def bench_stages(corpus, options=None):
+    """times remove_vocalization, find_long_affix, find_short_affix and analyze
+    separately, optionally writing the results as JSON and failing if a stage
+    regressed against a baseline written by an earlier run. The caches are
+    turned off, so that analyze is timed doing the analysis rather than
+    looking it up in ANALYZE_CACHE"""
+    corpus_options = ['corpus', 'tokens', 'vocab', 'skew', 'seed']
+    results = {'corpus': dict((k, getattr(options, k)) for k in corpus_options) if options else {},
+               'python': platform.python_version(), 'caches': 'off', 'stages': {}}
+    fst.set_cache_size(0)
+    try:
+        for stage, func, args in stage_inputs(corpus):
+            stats = time_stage(func, args)
+            results['stages'][stage] = stats
+            print("%-20s %10.0f tokens/s  p50 %7.0f ns  p90 %7.0f ns  p99 %7.0f ns" %
+                  (stage, stats['tokens_per_sec'], stats['p50_ns'], stats['p90_ns'], stats['p99_ns']))
+    finally:
+        fst.set_cache_size(fst.DEFAULT_CACHE_SIZE)
+    if options and options.json:
+        with open(options.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if options and options.baseline:
+        with open(options.baseline) as f:
+            try:
+                regressions = compare_to_baseline(results, json.load(f), options.threshold)
+            except ValueError as error:
+                sys.exit("not comparing to %s: %s" % (options.baseline, error))
+        if regressions:
+            sys.exit("stages regressed by more than %d%%:\n  " % (options.threshold * 100) +
+                     "\n  ".join(regressions))
+    return results
+
+
+BENCHMARKS = {'stages': bench_stages, 'tries': bench_affix_tries, 'parallel': bench_parallel,
+              'import': bench_import, 'patterns': bench_patterns, 'batch': bench_batch,
+              'nbest': bench_nbest, 'types': bench_types}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="benchmarks for the affixational FST")
+    parser.add_argument('benchmark', nargs='?', default='stages', choices=sorted(BENCHMARKS))
+    parser.add_argument('--tokens', type=int, default=1000000, help="size of the corpus")
+    parser.add_argument('--corpus', default='synthetic', choices=['synthetic', 'udhr'],
+                        help="random words, or the sample text of the FST repeated")
+    parser.add_argument('--vocab', type=int, default=50000, help="number of distinct synthetic words")
+    parser.add_argument('--skew', type=float, default=1.0, help="Zipf exponent of the synthetic word frequencies")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="write the stage results to this file")
+    parser.add_argument('--baseline', help="stage results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="fraction of a stage's baseline throughput it may lose before failing")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    options = parse_args()
+    if options.benchmark == 'import':
+        bench_import()
+    else:
+        if options.corpus == 'udhr':
+            corpus = make_udhr_corpus(options.tokens)
+        else:
+            corpus = make_corpus(options.tokens, options.vocab, options.skew, options.seed)
+        if options.benchmark == 'stages':
+            bench_stages(corpus, options)
+        else:
+            BENCHMARKS[options.benchmark](corpus)